@@ -0,0 +1,320 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+# End-to-end load test of the bot webhook against a local stand-in for the
+# Telegram Bot API. Nothing leaves the machine, so it can run offline in CI:
+#
+#   bench --site <site> execute flexiattend.benchmarks.checkin_load.run \
+#       --kwargs "{'employees': 200, 'concurrency': 16, 'attachments': 2}"
+#
+# Every simulated employee walks SITE_VERIFICATION -> EMPLOYEE_ID -> LOCATION
+# (the bot preselects IN/OUT, so MENU is skipped) through flexiattend_bot.webhook,
+# with updates drained inline in the calling thread (see the test hook in
+# bot_settings). It uses the given employee_ids, else the site's Active
+# employees enrolled in FlexiAttend; the Employee Checkins created by the run
+# are deleted afterwards unless cleanup=False. test_checkin_load runs it in CI
+# against fixture employees of its own.
+
+import itertools
+import json
+import resource
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import frappe
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+BENCH_BOT_TOKEN = "100000:FLEXIATTEND-BENCHMARK"
+BENCH_SITE_TOKEN = "BENCHMARK:SITE-TOKEN"
+BENCH_CHAT_ID_BASE = 9_000_000_000
+STEPS = ("start", "site_code", "employee_id", "attachment", "location")
+
+
+# ---- Fake Telegram Bot API ---- #
+class FakeTelegramAPI:
+    """Answers sendMessage, getFile and file downloads like api.telegram.org"""
+
+    def __init__(self, file_size=150_000):
+        self.file_bytes = b"\xff\xd8\xff\xe0" + b"\0" * max(file_size - 4, 0)
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, method):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith("/file/"):
+                    api._count("download")
+                    self._reply(api.file_bytes, "application/octet-stream")
+                else:
+                    self._api_call({})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+                self._api_call(params)
+
+            def _api_call(self, params):
+                method = self.path.rstrip("/").rsplit("/", 1)[-1]
+                api._count(method)
+                self._reply(json.dumps({"ok": True, "result": api._result(method, params)}).encode())
+
+            def _reply(self, body, content_type="application/json"):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def _result(self, method, params):
+        if method == "sendMessage":
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+                "text": params.get("text", "")
+            }
+        if method == "getFile":
+            file_id = params.get("file_id", "file")
+            return {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_size": len(self.file_bytes),
+                "file_path": f"photos/{file_id}.jpg"
+            }
+        if method == "getMe":
+            return {"id": 100000, "is_bot": True, "first_name": "FlexiAttend", "username": "flexiattend_benchmark_bot"}
+        return True
+
+
+# ---- Simulated employee ---- #
+class _QueryCounter:
+    """Counts SQL statements sent through one thread's database connection"""
+
+    def __init__(self, db):
+        self.count = 0
+        self._sql = db.sql
+        db.sql = self
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+        return self._sql(*args, **kwargs)
+
+
+def _message(chat_id, message_id, **content):
+    return {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+        **content
+    }
+
+
+def _post_update(update):
+    from flexiattend.triggers import flexiattend_bot
+
+    raw = json.dumps(update)
+    frappe.local.request = Request(
+        EnvironBuilder(method="POST", data=raw, content_type="application/json").get_environ()
+    )
+    frappe.local.form_dict = frappe._dict(update)
+    return flexiattend_bot.webhook()
+
+
+def _walk_conversation(employee_id, chat_id, attachments, update_ids, queries):
+    """Run one full check-in conversation, returns {step: [seconds]}"""
+    timings = {}
+    message_ids = itertools.count(1)
+
+    def step(name, **content):
+        message_id = next(message_ids)
+        update = {"update_id": next(update_ids), "message": _message(chat_id, message_id, **content)}
+        before = queries.count
+        started = time.perf_counter()
+        _post_update(update)
+        timings.setdefault(name, []).append(time.perf_counter() - started)
+        return queries.count - before, message_id
+
+    step("start", text="/start")
+    step("site_code", text=BENCH_SITE_TOKEN)
+    step("employee_id", text=employee_id)
+    for i in range(attachments):
+        file_id = f"bench-{chat_id}-{i}"
+        step("attachment", photo=[{"file_id": file_id, "file_unique_id": file_id, "width": 1280, "height": 960}])
+    location = {"latitude": 10.0 + chat_id % 1000 / 1e4, "longitude": 76.0}
+    checkin_queries, message_id = step("location", location=location)
+    # The key the bot gives the check-in made from this location message
+    return timings, checkin_queries, f"tg:{chat_id}:{message_id}"
+
+
+# ---- Runner ---- #
+def run(employees=50, concurrency=8, attachments=0, file_size=150_000, trace_memory=False, cleanup=True,
+        employee_ids=None):
+    """Simulate ``employees`` concurrent check-ins and print a latency report"""
+    from flexiattend.triggers import outbound
+    from flexiattend.triggers.bot_settings import TEST_HOOK_FLAG, get_erp_settings
+
+    employee_ids = employee_ids or frappe.get_all(
+        "Employee",
+        filters={"status": "Active", "custom_add_employee_to_flexiattend": 1},
+        pluck="name",
+        limit=employees
+    )
+    if not employee_ids:
+        frappe.throw("The benchmark needs at least one Active employee enrolled in FlexiAttend")
+
+    api = FakeTelegramAPI(file_size=file_size).start()
+    site, sites_path = frappe.local.site, frappe.local.sites_path
+
+    # Point the bot at the fake API in the benchmark's own site contexts only;
+    # live workers of the site keep the real settings
+    settings_override = {
+        "BOT_TOKEN": BENCH_BOT_TOKEN,
+        "BOT_API_URL": f"{api.url}/bot",
+        "BOT_FILE_URL": f"{api.url}/file/bot",
+        "SITE_TOKEN": BENCH_SITE_TOKEN,
+        "ATTACHMENT_ENABLED": True,
+        "MAX_ATTACHMENTS": max(attachments, get_erp_settings()["MAX_ATTACHMENTS"])
+    }
+    # The fake API has no send limits; measure the server, not Telegram's quota
+    rate_limits = outbound.GLOBAL_RATE, outbound.GLOBAL_BURST
+    outbound.GLOBAL_RATE = outbound.GLOBAL_BURST = 100_000
+
+    # Every simulated chat walks the full first-time conversation
+    chat_ids = [BENCH_CHAT_ID_BASE + index for index in range(employees)]
+    _unbind_benchmark_chats(chat_ids)
+
+    update_ids = itertools.count(int(time.time()) * 1000)
+    results_lock = threading.Lock()
+    timings = {name: [] for name in STEPS}
+    checkin_queries = []
+    idempotency_keys = []
+    errors = []
+
+    def simulate(index):
+        employee_id = employee_ids[index % len(employee_ids)]
+        frappe.init(site=site, sites_path=sites_path)
+        frappe.connect()
+        frappe.set_user("Guest")
+        frappe.flags[TEST_HOOK_FLAG] = {"settings": settings_override, "process_inline": True}
+        try:
+            queries = _QueryCounter(frappe.local.db)
+            step_timings, step_queries, idempotency_key = _walk_conversation(
+                employee_id, BENCH_CHAT_ID_BASE + index, attachments, update_ids, queries
+            )
+            with results_lock:
+                for name, values in step_timings.items():
+                    timings[name].extend(values)
+                checkin_queries.append(step_queries)
+                idempotency_keys.append(idempotency_key)
+        except Exception as e:
+            with results_lock:
+                errors.append(repr(e))
+        finally:
+            frappe.destroy()
+
+    if trace_memory:
+        tracemalloc.start()
+    wall_started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(simulate, range(employees)))
+        wall = time.perf_counter() - wall_started
+    finally:
+        api.stop()
+        outbound.GLOBAL_RATE, outbound.GLOBAL_BURST = rate_limits
+
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    report = {
+        "employees": employees,
+        "concurrency": concurrency,
+        "attachments_per_checkin": attachments,
+        "errors": len(errors),
+        "wall_seconds": round(wall, 3),
+        "checkins_per_second": round(len(checkin_queries) / wall, 2) if wall else None,
+        "steps": {name: _summarise(values) for name, values in timings.items() if values},
+        "db_queries_per_checkin": round(sum(checkin_queries) / len(checkin_queries), 1) if checkin_queries else None,
+        "telegram_calls": dict(api.calls),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_traced_python_mb": round(traced_peak / 1024 / 1024, 1) if traced_peak is not None else None,
+        "sample_errors": errors[:5]
+    }
+
+    if cleanup:
+        _delete_benchmark_checkins(idempotency_keys)
+        _unbind_benchmark_chats(chat_ids)
+
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def _summarise(values):
+    values = sorted(values)
+
+    def percentile(p):
+        return round(values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000, 2)
+
+    return {"count": len(values), "p50_ms": percentile(50), "p95_ms": percentile(95), "p99_ms": percentile(99)}
+
+
+def _delete_benchmark_checkins(idempotency_keys):
+    from flexiattend.triggers.checkin_service import IDEMPOTENCY_FIELD
+
+    # Only check-ins of the simulated chats; real punches made during the run stay
+    if not idempotency_keys:
+        return
+    names = frappe.get_all(
+        "Employee Checkin",
+        filters={IDEMPOTENCY_FIELD: ["in", idempotency_keys]},
+        pluck="name"
+    )
+    for name in names:
+        frappe.delete_doc("Employee Checkin", name, ignore_permissions=True, force=True)
+    frappe.db.commit()
+
+
+def _unbind_benchmark_chats(chat_ids):
+    from flexiattend.triggers.chat_binding import BINDING_DOCTYPE, clear_chat_binding_cache
+
+    frappe.db.delete(BINDING_DOCTYPE, {"name": ["in", [str(chat_id) for chat_id in chat_ids]]})
+    frappe.db.commit()
+    for chat_id in chat_ids:
+        clear_chat_binding_cache(chat_id)
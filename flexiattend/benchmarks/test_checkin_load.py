@@ -0,0 +1,64 @@
+# Copyright (c) 2025, Sebin P Sabu and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from flexiattend.benchmarks import checkin_load
+
+FIXTURE_EMPLOYEES = 4
+
+
+class TestCheckinLoad(FrappeTestCase):
+	def setUp(self):
+		if not frappe.db.exists("DocType", "Employee Checkin"):
+			self.skipTest("The load test needs HRMS installed")
+		company = frappe.db.get_value("Company", {}, "name")
+		if not company:
+			self.skipTest("The load test needs a Company to create employees in")
+
+		# The simulated chats run in threads on connections of their own, so
+		# the fixtures must be committed for them to see
+		self.employee_ids = [self._make_employee(company, index) for index in range(FIXTURE_EMPLOYEES)]
+		frappe.db.commit()
+		self.addCleanup(self._delete_employees)
+
+	def test_run(self):
+		report = checkin_load.run(employees=FIXTURE_EMPLOYEES, concurrency=2, employee_ids=self.employee_ids)
+
+		self.assertEqual(report["errors"], 0, report["sample_errors"])
+		self.assertEqual(report["steps"]["location"]["count"], FIXTURE_EMPLOYEES)
+		self.assertGreater(report["telegram_calls"].get("sendMessage", 0), 0)
+		# The run removes the check-ins it made
+		self.assertFalse(
+			frappe.get_all(
+				"Employee Checkin", filters={"employee": ["in", self.employee_ids]}, limit=1
+			)
+		)
+
+	def _make_employee(self, company, index):
+		gender = frappe.db.get_value("Gender", {}, "name")
+		if not gender:
+			gender = frappe.get_doc({"doctype": "Gender", "gender": "Other"}).insert(ignore_permissions=True).name
+		return (
+			frappe.get_doc(
+				{
+					"doctype": "Employee",
+					"first_name": f"_Test FlexiAttend Load {index}",
+					"gender": gender,
+					"date_of_birth": "1990-01-01",
+					"date_of_joining": "2020-01-01",
+					"company": company,
+					"status": "Active",
+					"custom_add_employee_to_flexiattend": 1,
+				}
+			)
+			.insert(ignore_permissions=True)
+			.name
+		)
+
+	def _delete_employees(self):
+		frappe.db.delete("Employee Checkin", {"employee": ["in", self.employee_ids]})
+		for employee_id in self.employee_ids:
+			frappe.delete_doc("Employee", employee_id, ignore_permissions=True, force=True)
+		frappe.db.commit()
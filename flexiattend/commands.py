@@ -0,0 +1,42 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-flexiattend-daily-summary")
+@click.option("--from-date", help="First day to rebuild (default: first FlexiAttend punch)")
+@click.option("--to-date", help="Last day to rebuild (default: today)")
+@click.option("--employee", help="Only rebuild this employee")
+@pass_context
+def rebuild_daily_summary(context, from_date=None, to_date=None, employee=None):
+    """Recompute FlexiAttend Daily Summary rows from Employee Checkin"""
+    import frappe
+
+    from flexiattend.triggers.daily_summary import rebuild_daily_summaries
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        rebuilt = rebuild_daily_summaries(from_date, to_date, employee)
+        click.echo(f"Rebuilt {rebuilt} daily summaries")
+    finally:
+        frappe.destroy()
+
+
+@click.command("flexiattend-poll")
+@click.option("--shards", default=1, type=int, help="Worker processes; chats are split by chat id")
+@click.option("--lanes", default=4, type=int, help="Chats handled at the same time per shard")
+@pass_context
+def poll(context, shards=1, lanes=4):
+    """Long-poll Telegram for FlexiAttend updates instead of using the webhook"""
+    import logging
+
+    from flexiattend.triggers.polling import run
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    run(get_site(context), ".", max(shards, 1), max(lanes, 1))
+
+
+commands = [rebuild_daily_summary, poll]
@@ -0,0 +1,14 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+from flexiattend.triggers.chat_binding import clear_chat_binding_cache
+
+
+class FlexiAttendChatBinding(Document):
+    def on_update(self):
+        clear_chat_binding_cache(self.name)
+
+    def on_trash(self):
+        clear_chat_binding_cache(self.name)
@@ -0,0 +1,52 @@
+# Copyright (c) 2025, Sebin P Sabu and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from flexiattend.triggers.chat_binding import (
+	BINDING_DOCTYPE,
+	clear_chat_binding_cache,
+	get_bound_employee,
+)
+
+TEST_CHAT_ID = "-1000000000001"
+TEST_EMPLOYEE = "_Test FlexiAttend Employee"
+
+
+class TestFlexiAttendChatBinding(FrappeTestCase):
+	def setUp(self):
+		eligibility = patch("flexiattend.triggers.chat_binding.is_employee_eligible", return_value=True)
+		eligibility.start()
+		self.addCleanup(eligibility.stop)
+
+		frappe.get_doc(
+			{"doctype": BINDING_DOCTYPE, "chat_id": TEST_CHAT_ID, "employee": TEST_EMPLOYEE, "token_version": 1}
+		).insert(ignore_permissions=True, ignore_links=True)
+		self.addCleanup(clear_chat_binding_cache, TEST_CHAT_ID)
+		self.addCleanup(frappe.db.delete, BINDING_DOCTYPE, {"name": TEST_CHAT_ID})
+
+	def test_binding_of_current_token(self):
+		with self._site_token_version(1):
+			self.assertEqual(get_bound_employee(TEST_CHAT_ID), TEST_EMPLOYEE)
+
+	def test_site_token_change_retires_cached_binding(self):
+		with self._site_token_version(1):
+			self.assertEqual(get_bound_employee(TEST_CHAT_ID), TEST_EMPLOYEE)
+
+		# The binding is cached now; the new token version alone must reject it
+		with self._site_token_version(2):
+			self.assertIsNone(get_bound_employee(TEST_CHAT_ID))
+
+	def test_unregistered_chat(self):
+		frappe.db.delete(BINDING_DOCTYPE, {"name": TEST_CHAT_ID})
+		clear_chat_binding_cache(TEST_CHAT_ID)
+		with self._site_token_version(1):
+			self.assertIsNone(get_bound_employee(TEST_CHAT_ID))
+
+	def _site_token_version(self, version):
+		return patch(
+			"flexiattend.triggers.chat_binding.get_erp_settings", return_value={"SITE_TOKEN_VERSION": version}
+		)
@@ -0,0 +1,8 @@
+// Copyright (c) 2025, Sebin P Sabu and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("FlexiAttend Daily Summary", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,11 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+from flexiattend.triggers.daily_summary import summary_name
+
+
+class FlexiAttendDailySummary(Document):
+    def autoname(self):
+        self.name = summary_name(self.employee, self.attendance_date)
@@ -0,0 +1,78 @@
+# Copyright (c) 2025, Sebin P Sabu and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_datetime
+
+from flexiattend.triggers.daily_summary import summarise
+
+
+def punches(*entries):
+	return [
+		frappe._dict(
+			time=get_datetime(time),
+			log_type=log_type,
+			latitude=10.0,
+			longitude=76.0,
+			custom_flexiattend_work_site=None,
+		)
+		for log_type, time in entries
+	]
+
+
+class TestFlexiAttendDailySummary(FrappeTestCase):
+	def test_in_out_pairs(self):
+		summary = summarise(
+			punches(
+				("IN", "2025-01-06 09:00:00"),
+				("OUT", "2025-01-06 12:30:00"),
+				("IN", "2025-01-06 13:00:00"),
+				("OUT", "2025-01-06 17:45:00"),
+			)
+		)
+		self.assertEqual(summary["punch_count"], 4)
+		self.assertEqual(summary["worked_minutes"], 210 + 285)
+		self.assertEqual(summary["first_in"], get_datetime("2025-01-06 09:00:00"))
+		self.assertEqual(summary["last_out"], get_datetime("2025-01-06 17:45:00"))
+		self.assertEqual(summary["last_log_type"], "OUT")
+
+	def test_repeated_in_keeps_the_earlier_one(self):
+		summary = summarise(
+			punches(
+				("IN", "2025-01-06 09:00:00"),
+				("IN", "2025-01-06 09:30:00"),
+				("OUT", "2025-01-06 10:00:00"),
+			)
+		)
+		self.assertEqual(summary["worked_minutes"], 60)
+
+	def test_unmatched_punches(self):
+		# An OUT with no IN before it and a trailing IN add no time
+		summary = summarise(
+			punches(
+				("OUT", "2025-01-06 08:00:00"),
+				("IN", "2025-01-06 09:00:00"),
+				("OUT", "2025-01-06 10:00:00"),
+				("IN", "2025-01-06 11:00:00"),
+			)
+		)
+		self.assertEqual(summary["worked_minutes"], 60)
+		self.assertEqual(summary["first_in"], get_datetime("2025-01-06 09:00:00"))
+		self.assertEqual(summary["last_out"], get_datetime("2025-01-06 10:00:00"))
+		self.assertEqual(summary["last_log_type"], "IN")
+		self.assertEqual(summary["last_punch"], get_datetime("2025-01-06 11:00:00"))
+
+	def test_day_rollover(self):
+		# A night shift is summarised per calendar day: the IN and the OUT
+		# after midnight stay unmatched on their own days
+		evening = summarise(punches(("IN", "2025-01-06 22:00:00")))
+		morning = summarise(punches(("OUT", "2025-01-07 06:00:00")))
+
+		self.assertEqual(evening["worked_minutes"], 0)
+		self.assertEqual(evening["first_in"], get_datetime("2025-01-06 22:00:00"))
+		self.assertIsNone(evening["last_out"])
+
+		self.assertEqual(morning["worked_minutes"], 0)
+		self.assertIsNone(morning["first_in"])
+		self.assertEqual(morning["last_out"], get_datetime("2025-01-07 06:00:00"))
@@ -84,6 +84,65 @@ frappe.ui.form.on('FlexiAttend Settings', {
                 }, 100);
             }, __('Actions'));
 
+            // Bulk Enrolment Button
+            frm.add_custom_button(__('Bulk Enrolment'), function() {
+                let d = new frappe.ui.Dialog({
+                    title: __('Bulk Enrolment'),
+                    fields: [
+                        {
+                            label: 'Action',
+                            fieldname: 'action',
+                            fieldtype: 'Select',
+                            options: ['Enrol', 'Remove'],
+                            default: 'Enrol',
+                            reqd: 1
+                        },
+                        {
+                            label: 'Company',
+                            fieldname: 'company',
+                            fieldtype: 'Link',
+                            options: 'Company'
+                        },
+                        {
+                            label: 'Department',
+                            fieldname: 'department',
+                            fieldtype: 'Link',
+                            options: 'Department'
+                        },
+                        {
+                            label: 'Branch',
+                            fieldname: 'branch',
+                            fieldtype: 'Link',
+                            options: 'Branch'
+                        }
+                    ],
+                    primary_action_label: __('Apply'),
+                    primary_action(values) {
+                        if (!values.company && !values.department && !values.branch) {
+                            frappe.msgprint(__('Select a Department, Branch or Company'));
+                            return;
+                        }
+                        frappe.call({
+                            method: 'flexiattend.triggers.api.bulk_update_enrolment',
+                            args: {
+                                enrol: values.action === 'Enrol' ? 1 : 0,
+                                company: values.company,
+                                department: values.department,
+                                branch: values.branch
+                            },
+                            callback: function(r) {
+                                if (r.message) {
+                                    frappe.show_alert({message: r.message.message, indicator: 'blue'});
+                                }
+                                d.hide();
+                            }
+                        });
+                    }
+                });
+
+                d.show();
+            }, __('Actions'));
+
             // Toggle Attachment Feature Button
             const render_attachment_toggle = () => {
                 // Remove previous toggle button if exists
@@ -1,9 +1,14 @@
 # Copyright (c) 2025, Sebin P Sabu and contributors
 # For license information, please see license.txt
 
+import json
+
 import frappe
+from frappe import _
 from frappe.model.document import Document
 
+from flexiattend.triggers.bot_settings import publish_settings
+
 
 class FlexiAttendSettings(frappe.model.document.Document):
     def validate(self):
@@ -14,3 +19,35 @@ class FlexiAttendSettings(frappe.model.document.Document):
             self.erpnext_base_url = ""
             # self.site_token = ""
 
+        # Chat bindings carry the version they were made with, so bumping it
+        # retires all of them without touching a single row
+        if not self.is_new() and self.has_value_changed("site_token"):
+            self.site_token_version = (self.site_token_version or 0) + 1
+
+        if not 1 <= (self.attachment_download_concurrency or 0) <= 10:
+            self.attachment_download_concurrency = 4
+        if (self.attachment_download_timeout or 0) <= 0:
+            self.attachment_download_timeout = 20
+        if (self.download_cache_size or 0) < 0:
+            self.download_cache_size = 0
+        if (self.image_max_dimension or 0) < 320:
+            self.image_max_dimension = 1600
+        if not 1 <= (self.image_quality or 0) <= 95:
+            self.image_quality = 80
+
+        self.validate_log_sampling_rates()
+
+    def validate_log_sampling_rates(self):
+        if not self.log_sampling_rates:
+            return
+        try:
+            rates = json.loads(self.log_sampling_rates)
+            valid = isinstance(rates, dict) and all(0 <= float(rate) <= 1 for rate in rates.values())
+        except (ValueError, TypeError):
+            valid = False
+        if not valid:
+            frappe.throw(_("Log Sampling Rates must be a JSON object of event type to a rate between 0 and 1"))
+
+    def on_update(self):
+        # Bump the cached settings version so every worker picks up the change
+        publish_settings(self)
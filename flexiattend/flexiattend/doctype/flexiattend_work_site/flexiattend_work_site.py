@@ -0,0 +1,32 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from flexiattend.triggers.geofence import clear_geofence_index, parse_polygon
+
+
+class FlexiAttendWorkSite(Document):
+    def validate(self):
+        if self.shape == "Polygon":
+            try:
+                parse_polygon(self.polygon)
+            except (ValueError, TypeError):
+                frappe.throw(_("Polygon must be a JSON list of [latitude, longitude] points"))
+        elif not (-90 <= (self.latitude or 0) <= 90 and -180 <= (self.longitude or 0) <= 180):
+            frappe.throw(_("Latitude or Longitude is out of range"))
+
+        for row in self.assignments:
+            if not row.employee and not row.branch:
+                frappe.throw(_("Row {0}: set an Employee or a Branch").format(row.idx))
+
+    def on_update(self):
+        clear_geofence_index()
+
+    def on_trash(self):
+        clear_geofence_index()
+
+    def after_rename(self, old, new, merge=False):
+        clear_geofence_index()
@@ -0,0 +1,59 @@
+# Copyright (c) 2025, Sebin P Sabu and Contributors
+# See license.txt
+
+import math
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from flexiattend.triggers.geofence import (
+	INSIDE,
+	NEAREST_SCAN_SITES,
+	NO_WORK_SITE,
+	OUTSIDE,
+	GeofenceIndex,
+	WorkSite,
+)
+
+
+class TestFlexiAttendWorkSite(FrappeTestCase):
+	def setUp(self):
+		self.office = WorkSite("Office", 9.9312, 76.2673, 150)
+		self.yard = WorkSite("Yard", polygon=[(9.9400, 76.2700), (9.9400, 76.2750), (9.9450, 76.2750), (9.9450, 76.2700)])
+		self.index = GeofenceIndex(
+			[self.office, self.yard],
+			[frappe._dict(parent="Yard", employee="EMP-0001", branch=None)],
+		)
+
+	def test_circle(self):
+		status, site, distance = self.index.check(9.9313, 76.2674, "EMP-0002")
+		self.assertEqual((status, site), (INSIDE, "Office"))
+		self.assertLess(distance, 150)
+
+		status, site, distance = self.index.check(9.9400, 76.2673, "EMP-0002")
+		self.assertEqual((status, site), (OUTSIDE, "Office"))
+		self.assertGreater(distance, 150)
+
+	def test_polygon_assignment(self):
+		self.assertEqual(self.index.check(9.9420, 76.2720, "EMP-0001")[:2], (INSIDE, "Yard"))
+		# Yard is assigned to EMP-0001 only
+		self.assertEqual(self.index.check(9.9420, 76.2720, "EMP-0002")[:2], (OUTSIDE, "Office"))
+
+	def test_no_work_site(self):
+		index = GeofenceIndex([self.yard], [frappe._dict(parent="Yard", employee="EMP-0001", branch=None)])
+		self.assertEqual(index.check(9.9420, 76.2720, "EMP-0002")[0], NO_WORK_SITE)
+
+	def test_nearest_site_from_grid_rings(self):
+		# More global sites than are measured one by one, ~1.1 km apart along a meridian
+		sites = [WorkSite(f"Site {i}", 10.0 + i * 0.01, 76.0, 50) for i in range(NEAREST_SCAN_SITES + 4)]
+		index = GeofenceIndex(sites, [])
+
+		for latitude, longitude in ((10.0333, 76.004), (9.995, 75.99), (10.1, 76.03)):
+			status, site, distance = index.check(latitude, longitude)
+			lat_rad, lon_rad = math.radians(latitude), math.radians(longitude)
+			expected = min(sites, key=lambda s: s.distance(lat_rad, lon_rad, math.cos(lat_rad)))
+			self.assertEqual((status, site), (OUTSIDE, expected.name))
+			self.assertGreater(distance, 50)
+
+		# Past the search radius no site is named
+		self.assertEqual(index.check(11.0, 76.0), (OUTSIDE, None, None))
@@ -91,6 +91,11 @@ app_license = "mit"
 # before_uninstall = "flexiattend.uninstall.before_uninstall"
 # after_uninstall = "flexiattend.uninstall.after_uninstall"
 
+after_migrate = [
+    "flexiattend.triggers.eligibility.warm_eligibility_cache",
+    "flexiattend.triggers.geofence.clear_geofence_index"
+]
+
 # Integration Setup
 # ------------------
 # To set up dependencies/integrations with other apps
@@ -145,6 +150,28 @@ app_license = "mit"
 # 	}
 # }
 
+doc_events = {
+    "Employee": {
+        "on_update": "flexiattend.triggers.eligibility.on_employee_update",
+        "on_trash": "flexiattend.triggers.eligibility.on_employee_update",
+        "after_rename": "flexiattend.triggers.eligibility.on_employee_rename"
+    },
+    "Employee Checkin": {
+        "after_insert": [
+            "flexiattend.triggers.punch_state.on_checkin_insert",
+            "flexiattend.triggers.daily_summary.on_checkin_insert"
+        ],
+        "on_update": [
+            "flexiattend.triggers.punch_state.on_checkin_change",
+            "flexiattend.triggers.daily_summary.on_checkin_change"
+        ],
+        "on_trash": [
+            "flexiattend.triggers.punch_state.on_checkin_change",
+            "flexiattend.triggers.daily_summary.on_checkin_change"
+        ]
+    }
+}
+
 # Scheduled Tasks
 # ---------------
 # scheduler_events = {
@@ -153,6 +180,13 @@ app_license = "mit"
 #     ]
 # }
 
+scheduler_events = {
+    "all": [
+        "flexiattend.triggers.attachments.retry_pending_attachments",
+        "flexiattend.triggers.outbound.resume_bulk_messages"
+    ]
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"flexiattend.tasks.all"
@@ -203,11 +237,17 @@ app_license = "mit"
 # ----------------
 # before_request = ["flexiattend.utils.before_request"]
 # after_request = ["flexiattend.utils.after_request"]
+# Metrics observed during a request or background job are written once at its end
+after_request = ["flexiattend.triggers.metrics.flush_metrics"]
 
 # Job Events
 # ----------
 # before_job = ["flexiattend.utils.before_job"]
 # after_job = ["flexiattend.utils.after_job"]
+after_job = [
+    "flexiattend.triggers.metrics.flush_metrics",
+    "flexiattend.triggers.bot_log.flush_log"
+]
 
 # User Data Protection
 # --------------------
@@ -2,76 +2,76 @@
 # For license information, please see license.txt
 
 import frappe
-from frappe import _
+from frappe.utils import cint
+from werkzeug.wrappers import Response
+
+from flexiattend.triggers import checkin_service, enrolment
+from flexiattend.triggers.attachments import get_uploaded_files
+from flexiattend.triggers.export import export_checkins
+from flexiattend.triggers.metrics import render_metrics, timer
+from flexiattend.triggers.outbound import get_outbound_stats
+
 
 @frappe.whitelist(allow_guest=True)
 def validate_employee(employee_id=None):
     """Validate Employee exists by document name and status"""
-    if not employee_id:
-        return {"status": "error", "message": _("Employee ID missing")}
+    with timer("endpoint", "validate_employee"):
+        return checkin_service.validate_employee(employee_id)
+
 
-    # Use exact document name
-    if not frappe.db.exists("Employee", {"name": employee_id, "status": "Active", "custom_add_employee_to_flexiattend": 1}):
-        return {"status": "error", "message": _("Invalid Employee ID")}
+@frappe.whitelist(allow_guest=True)
+def create_employee_checkin(employee_id, log_type, latitude=None, longitude=None, attachments=None, idempotency_key=None):
+    """Create Employee Checkin and attach files
 
-    return {"status": "success", "message": _(f"Employee {employee_id} exists")}
+    Files can be sent as multipart parts named ``attachments`` (preferred) or,
+    for older clients, as a JSON list of base64 encoded ``attachments``.
+    Retries should repeat the ``idempotency_key`` (or ``Idempotency-Key`` header).
+    """
+    with timer("endpoint", "create_employee_checkin"):
+        return checkin_service.create_checkin(
+            employee_id,
+            log_type,
+            latitude,
+            longitude,
+            attachments,
+            files=get_uploaded_files(),
+            idempotency_key=idempotency_key or frappe.get_request_header("Idempotency-Key")
+        )
 
 
-@frappe.whitelist(allow_guest=True)
-def create_employee_checkin(employee_id, log_type, latitude=None, longitude=None, attachments=None):
-    """Create Employee Checkin and attach files"""
-    if not frappe.db.exists("Employee", employee_id):
-        return {"status": "error", "message": _("Invalid Employee ID")}
-
-    # Convert lat/lon to float
-    try:
-        latitude = float(latitude) if latitude else None
-        longitude = float(longitude) if longitude else None
-    except ValueError:
-        latitude = longitude = None
-
-    checkin = frappe.get_doc({
-        "doctype": "Employee Checkin",
-        "employee": employee_id,
-        "log_type": log_type,
-        "time": frappe.utils.now_datetime(),
-        "device_id": "FlexiAttend",
-        "latitude": latitude,
-        "longitude": longitude
-    })
-    checkin.insert(ignore_permissions=True)
-    
-    # Handle attachments
-    if attachments:
-        # attachments should be a list of dicts: [{"filename": ..., "filedata": ...}]
-        import base64
-        import json
-
-        if isinstance(attachments, str):
-            try:
-                attachments = json.loads(attachments)
-            except Exception:
-                attachments = []
-
-        for att in attachments:
-            filedata = att.get("filedata")
-            filename = att.get("filename")
-            if filedata and filename:
-                # filedata should be base64 encoded string
-                frappe.get_doc({
-                    "doctype": "File",
-                    "file_name": filename,
-                    "attached_to_doctype": "Employee Checkin",
-                    "attached_to_name": checkin.name,
-                    "content": filedata,  # raw/base64 bytes
-                    "decode": True
-                }).insert(ignore_permissions=True)
-
-    frappe.db.commit()
-
-    return {
-        "status": "success",
-        "message": f"{log_type} recorded for {employee_id} at {latitude}, {longitude}",
-        "checkin_id": checkin.name
-    }
+@frappe.whitelist()
+def create_employee_checkins_bulk(checkins):
+    """Create many Employee Checkins in batches and return a result per item"""
+    frappe.only_for(("System Manager", "HR Manager"))
+    with timer("endpoint", "create_employee_checkins_bulk"):
+        return checkin_service.create_checkins_bulk(checkins)
+
+
+@frappe.whitelist()
+def get_outbound_message_stats():
+    """Send-queue depth and latency of the bot's outbound messages"""
+    frappe.only_for("System Manager")
+    return get_outbound_stats()
+
+
+@frappe.whitelist()
+def metrics():
+    """Bot and API metrics in the Prometheus text format, for a scraper using an API key"""
+    frappe.only_for("System Manager")
+    return Response(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@frappe.whitelist()
+def bulk_update_enrolment(enrol=1, department=None, branch=None, company=None):
+    """Queue enrolment (enrol=1) or removal (enrol=0) of every employee matching the filters"""
+    frappe.only_for(("System Manager", "HR Manager"))
+    return enrolment.queue_enrolment(cint(enrol), department, branch, company)
+
 
+@frappe.whitelist()
+def export_flexiattend_checkins(from_date, to_date, file_format="csv", employee=None, department=None,
+                                branch=None, company=None, log_type=None):
+    """Download FlexiAttend check-ins with locations and attachments as csv, ndjson or parquet"""
+    frappe.only_for(("System Manager", "HR Manager"))
+    with timer("endpoint", "export_flexiattend_checkins"):
+        return export_checkins(from_date, to_date, file_format, employee, department, branch, company, log_type)
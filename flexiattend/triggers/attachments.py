@@ -0,0 +1,238 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, format_datetime, now_datetime
+
+from flexiattend.triggers.chat_binding import get_employee_chats
+from flexiattend.triggers.image_optimiser import ORIGINAL_SIZE_FIELD, queue_image_optimisation
+from flexiattend.triggers.outbound import queue_bulk_message
+
+# Form field name used by the bot for multipart check-in uploads
+UPLOAD_FIELD = "attachments"
+# SHA-256 of an attachment exactly as it arrived, before any optimisation
+SOURCE_HASH_FIELD = "custom_flexiattend_source_hash"
+
+# Attachments are staged on local disk and turned into File documents after the check-in commits
+SPOOL_FOLDER = "flexiattend_attachments"
+ATTACHMENT_STATUS_FIELD = "custom_flexiattend_attachment_status"
+ATTACHMENT_ATTEMPTS_FIELD = "custom_flexiattend_attachment_attempts"
+PENDING = "Pending"
+SAVED = "Saved"
+FAILED = "Failed"
+MAX_ATTEMPTS = 5
+# Pending check-ins untouched for this long are picked up again by the scheduler
+RETRY_AFTER_MINUTES = 5
+# Staged folders of check-ins that never committed are removed after this long
+ORPHAN_AFTER_SECONDS = 24 * 60 * 60
+
+
+class InvalidAttachmentError(frappe.ValidationError):
+    pass
+
+
+def get_uploaded_files():
+    """Return the multipart file parts of the current request as [(filename, stream)]"""
+    request = getattr(frappe.local, "request", None)
+    if not request or not request.files:
+        return []
+    return [(f.filename, f.stream) for f in request.files.getlist(UPLOAD_FIELD) if f and f.filename]
+
+
+def decode_attachments(attachments):
+    """Legacy JSON path: attachments is a list of {"filename": ..., "filedata": <base64>}"""
+    if isinstance(attachments, str):
+        try:
+            attachments = json.loads(attachments)
+        except Exception:
+            attachments = []
+
+    return [
+        (att["filename"], _decode(att["filedata"], att["filename"]))
+        for att in attachments or []
+        if isinstance(att, dict) and att.get("filedata") and att.get("filename")
+    ]
+
+
+def stage_files(checkin_name, files):
+    """Spool [(filename, bytes or file-like)] to disk and persist them once the check-in commits"""
+    folder = _spool_path(checkin_name)
+    os.makedirs(folder, exist_ok=True)
+    for index, (filename, content) in enumerate(files):
+        path = os.path.join(folder, f"{index:02d}_{_safe_name(filename)}")
+        # Renamed into place so the job never sees a partial file
+        with open(f"{path}.part", "wb") as f:
+            if hasattr(content, "read"):
+                # Werkzeug parts are copied in chunks, never loaded whole
+                shutil.copyfileobj(content, f)
+            else:
+                f.write(content)
+        os.replace(f"{path}.part", path)
+
+    _enqueue_persist(checkin_name, enqueue_after_commit=True)
+
+
+def persist_staged_files(checkin_name):
+    """Background job: create a File for every staged attachment of the check-in"""
+    folder = _spool_path(checkin_name)
+    if not frappe.db.exists("Employee Checkin", checkin_name):
+        # The check-in was rolled back after staging
+        shutil.rmtree(folder, ignore_errors=True)
+        return
+
+    inserted = []
+    try:
+        for staged in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            if staged.endswith(".part"):
+                continue
+            path = os.path.join(folder, staged)
+            with open(path, "rb") as f:
+                content = f.read()
+            inserted.append(_insert_file(checkin_name, staged.split("_", 1)[1], content))
+            # Committed one by one, so a retry carries on where this attempt stopped
+            frappe.db.commit()
+            os.remove(path)
+    except Exception:
+        frappe.db.rollback()
+        _record_failure(checkin_name)
+        return
+
+    frappe.db.set_value("Employee Checkin", checkin_name, ATTACHMENT_STATUS_FIELD, SAVED)
+    queue_image_optimisation(inserted)
+    frappe.db.commit()
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+def retry_pending_attachments():
+    """Scheduler: queue again check-ins whose attachments are still pending, and drop orphaned spools"""
+    pending = frappe.get_all(
+        "Employee Checkin",
+        filters={
+            ATTACHMENT_STATUS_FIELD: PENDING,
+            "modified": ["<", add_to_date(now_datetime(), minutes=-RETRY_AFTER_MINUTES)]
+        },
+        pluck="name"
+    )
+    for checkin_name in pending:
+        _enqueue_persist(checkin_name)
+
+    root = frappe.get_site_path("private", SPOOL_FOLDER)
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - ORPHAN_AFTER_SECONDS
+    for checkin_name in os.listdir(root):
+        folder = os.path.join(root, checkin_name)
+        if os.path.getmtime(folder) < cutoff and not frappe.db.exists("Employee Checkin", checkin_name):
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+def _enqueue_persist(checkin_name, enqueue_after_commit=False):
+    frappe.enqueue(
+        "flexiattend.triggers.attachments.persist_staged_files",
+        queue="short",
+        job_id=f"flexiattend_attachments::{checkin_name}",
+        deduplicate=True,
+        enqueue_after_commit=enqueue_after_commit,
+        checkin_name=checkin_name
+    )
+
+
+def _record_failure(checkin_name):
+    attempts = (frappe.db.get_value("Employee Checkin", checkin_name, ATTACHMENT_ATTEMPTS_FIELD) or 0) + 1
+    # Left Pending (with a fresh modified) until the scheduler retries it
+    status = FAILED if attempts >= MAX_ATTEMPTS else PENDING
+    frappe.db.set_value(
+        "Employee Checkin",
+        checkin_name,
+        {ATTACHMENT_STATUS_FIELD: status, ATTACHMENT_ATTEMPTS_FIELD: attempts}
+    )
+    frappe.db.commit()
+    if status == FAILED:
+        frappe.log_error(title=f"FlexiAttend: could not save attachments of {checkin_name}")
+        _notify_failure(checkin_name)
+
+
+def _notify_failure(checkin_name):
+    """Tell the employee on Telegram, as a bulk notification, that the attachments were lost"""
+    employee, checkin_time = frappe.db.get_value("Employee Checkin", checkin_name, ["employee", "time"])
+    text = _("The attachments of your check-in at {0} could not be saved. Please send them to HR.").format(
+        format_datetime(checkin_time)
+    )
+    for chat_id in get_employee_chats(employee):
+        queue_bulk_message(chat_id, text)
+
+
+def _spool_path(checkin_name):
+    return frappe.get_site_path("private", SPOOL_FOLDER, checkin_name)
+
+
+def _safe_name(filename):
+    return os.path.basename((filename or "").replace("\\", "/")).strip() or "attachment"
+
+
+def _insert_file(checkin_name, filename, content):
+    """Attach ``content`` to the check-in, linking an already stored copy instead of writing it again"""
+    source_hash = hashlib.sha256(content).hexdigest()
+
+    file_doc = {
+        "doctype": "File",
+        "file_name": filename,
+        "attached_to_doctype": "Employee Checkin",
+        "attached_to_name": checkin_name,
+        SOURCE_HASH_FIELD: source_hash
+    }
+    stored = _find_stored_file(source_hash)
+    if stored:
+        # Same bytes seen before: only a new File row pointing at the existing file
+        file_doc.update({
+            "file_url": stored.file_url,
+            "is_private": stored.is_private,
+            "file_size": stored.file_size,
+            "content_hash": stored.content_hash,
+            ORIGINAL_SIZE_FIELD: stored.get(ORIGINAL_SIZE_FIELD)
+        })
+    else:
+        file_doc["content"] = content
+
+    return frappe.get_doc(file_doc).insert(ignore_permissions=True)
+
+
+def _find_stored_file(source_hash):
+    stored = frappe.db.get_value(
+        "File",
+        {SOURCE_HASH_FIELD: source_hash, "attached_to_doctype": "Employee Checkin"},
+        ["file_url", "is_private", "file_size", "content_hash", ORIGINAL_SIZE_FIELD],
+        as_dict=True,
+        order_by="creation asc"
+    )
+    if stored and stored.file_url and _exists_on_disk(stored.file_url):
+        return stored
+    return None
+
+
+def _exists_on_disk(file_url):
+    path = file_url.lstrip("/")
+    if not path.startswith("private/"):
+        path = f"public/{path}"
+    return os.path.exists(frappe.get_site_path(path))
+
+
+def _decode(content, filename):
+    # Same handling as File(decode=True), including "data:<type>;base64," prefixes
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    if b"," in content:
+        content = content.split(b",", 1)[1]
+    try:
+        return base64.b64decode(content)
+    except (binascii.Error, ValueError):
+        raise InvalidAttachmentError(_("Attachment {0} is not valid base64").format(filename)) from None
@@ -0,0 +1,109 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+# Structured, sampled debug log of the bot. log_event() only appends to a
+# bounded in-memory ring buffer; a daemon thread writes the buffer in batches
+# as JSON lines to the site's logs/flexiattend_bot.log (and at the end of
+# every background job, since job processes do not outlive their job).
+# Error Log stays reserved for real failures.
+
+import atexit
+import collections
+import json
+import os
+import random
+import threading
+import time
+
+import frappe
+from frappe.utils import now
+
+from flexiattend.triggers.bot_settings import get_erp_settings
+
+LOG_FILE = "flexiattend_bot.log"
+BUFFER_SIZE = 10_000
+FLUSH_INTERVAL = 2
+# The file is rotated to <name>.1 once it grows past this
+MAX_FILE_BYTES = 20 * 1024 * 1024
+
+# Share of events of each type that are kept; other types are always kept
+DEFAULT_SAMPLING = {
+    "webhook_update": 0.1,
+    "duplicate_update": 1,
+    "session_conflict": 1
+}
+
+# (log path, JSON line); the oldest records are dropped when it is full
+_buffer = collections.deque(maxlen=BUFFER_SIZE)
+_dropped = 0
+_flush_lock = threading.Lock()
+_flusher_pid = None
+
+
+def log_event(event, **fields):
+    """Buffer one event if it is sampled in; never does any I/O itself"""
+    global _dropped
+    rate = get_erp_settings()["LOG_SAMPLING"].get(event, DEFAULT_SAMPLING.get(event, 1))
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+
+    record = {"timestamp": now(), "site": frappe.local.site, "event": event, **fields}
+    if rate < 1:
+        record["sample_rate"] = rate
+    if len(_buffer) == _buffer.maxlen:
+        _dropped += 1
+    _buffer.append((frappe.get_site_path("logs", LOG_FILE), json.dumps(record, default=str)))
+    _ensure_flusher()
+
+
+def flush_log(**kwargs):
+    """Write everything buffered so far; also used as the after_job hook"""
+    global _dropped
+    with _flush_lock:
+        batches = {}
+        while _buffer:
+            try:
+                path, line = _buffer.popleft()
+            except IndexError:
+                break
+            batches.setdefault(path, []).append(line)
+
+        if _dropped and batches:
+            path = next(iter(batches))
+            batches[path].append(json.dumps({"timestamp": now(), "event": "log_records_dropped", "count": _dropped}))
+            _dropped = 0
+
+        for path, lines in batches.items():
+            try:
+                _rotate(path)
+                with open(path, "a") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError:
+                # A debug log must never take the bot down
+                pass
+
+
+def _ensure_flusher():
+    global _flusher_pid
+    # Forked workers inherit the flag but not the thread
+    if _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    threading.Thread(target=_run_flusher, name="flexiattend-log-flusher", daemon=True).start()
+
+
+def _run_flusher():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush_log()
+
+
+def _rotate(path):
+    try:
+        if os.path.getsize(path) > MAX_FILE_BYTES:
+            os.replace(path, f"{path}.1")
+    except FileNotFoundError:
+        pass
+
+
+atexit.register(flush_log)
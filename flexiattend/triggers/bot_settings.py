@@ -0,0 +1,104 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import json
+
+import frappe
+
+# Redis value {"version": ..., "settings": {...}} written on every settings save
+SETTINGS_CACHE_KEY = "flexiattend:bot_settings"
+# Small stamp read on every call; the full settings are only re-read when it changes
+SETTINGS_VERSION_KEY = "flexiattend:bot_settings_version"
+
+# site -> (version, settings dict)
+_local_settings = {}
+
+# ---- TEST HOOK ---- #
+# The one switch tests and the load test use to change the bot in their own
+# site contexts: frappe.flags.flexiattend_test, a dict with any of
+#   "settings"        merged over the published settings, e.g. to point the
+#                     bot at a fake Telegram Bot API
+#   "process_inline"  handle webhook updates in the calling thread instead of
+#                     a background job
+# The app never sets it, and nothing in it is published to Redis.
+TEST_HOOK_FLAG = "flexiattend_test"
+
+
+def get_test_hook(option):
+    """Value of ``option`` in the test hook of the current site context, or None"""
+    return (frappe.flags.get(TEST_HOOK_FLAG) or {}).get(option)
+
+
+def get_erp_settings():
+    """Return FlexiAttend Settings as a dict, cached in process and in Redis"""
+    settings = _get_published_settings()
+    override = get_test_hook("settings")
+    return {**settings, **override} if override else settings
+
+
+def _get_published_settings():
+    cache = frappe.cache()
+    version = cache.get_value(SETTINGS_VERSION_KEY)
+    cached = _local_settings.get(frappe.local.site)
+    if version and cached and cached[0] == version:
+        return cached[1]
+
+    stored = cache.get_value(SETTINGS_CACHE_KEY)
+    if version and stored and stored.get("version") == version:
+        settings = stored["settings"]
+    else:
+        # First use on this site, or Redis was flushed
+        version, settings = publish_settings(frappe.get_single("FlexiAttend Settings"))
+
+    _local_settings[frappe.local.site] = (version, settings)
+    return settings
+
+
+def publish_settings(doc):
+    """Store the settings of ``doc`` in Redis under a new version stamp"""
+    settings = build_settings(doc)
+    version = frappe.generate_hash(length=10)
+    cache = frappe.cache()
+    cache.set_value(SETTINGS_CACHE_KEY, {"version": version, "settings": settings})
+    cache.set_value(SETTINGS_VERSION_KEY, version)
+    _local_settings.pop(frappe.local.site, None)
+    return version, settings
+
+
+def build_settings(doc):
+    return {
+        "BOT_TOKEN": doc.flexiattend_token,
+        # Not fields of the settings; only the load test points the bot elsewhere
+        "BOT_API_URL": "https://api.telegram.org/bot",
+        "BOT_FILE_URL": "https://api.telegram.org/file/bot",
+        "ERP_URL": doc.erpnext_base_url or "",
+        "SITE_TOKEN": doc.site_token,
+        "SITE_TOKEN_VERSION": int(getattr(doc, "site_token_version", 0) or 0),
+        "ENABLE_FLEXIATTEND": bool(getattr(doc, "enable_flexiattend", False)),
+        "MAX_ATTACHMENTS": getattr(doc, "maximum_file_attachments", 5) or 5,
+        "ATTACHMENT_ENABLED": bool(getattr(doc, "enable_attachment_feature_in_employee_checkin", False)),
+        "DOWNLOAD_CONCURRENCY": getattr(doc, "attachment_download_concurrency", 4) or 4,
+        "DOWNLOAD_TIMEOUT": getattr(doc, "attachment_download_timeout", 20) or 20,
+        "DOWNLOAD_CACHE_MB": _download_cache_size(doc),
+        "GEOFENCE_MODE": getattr(doc, "geofence_mode", None) or "Disabled",
+        "OPTIMISE_IMAGES": bool(getattr(doc, "optimise_attachment_images", False)),
+        "IMAGE_MAX_DIMENSION": getattr(doc, "image_max_dimension", 1600) or 1600,
+        "IMAGE_QUALITY": getattr(doc, "image_quality", 80) or 80,
+        "LOG_SAMPLING": _log_sampling(doc),
+        "ENFORCE_PUNCH_SEQUENCE": bool(getattr(doc, "enforce_punch_sequence", False))
+    }
+
+
+def _download_cache_size(doc):
+    # 0 is a valid value (cache disabled), so only a missing value falls back
+    size = getattr(doc, "download_cache_size", None)
+    return 256 if size is None else size
+
+
+def _log_sampling(doc):
+    # {"event type": share kept, 0 - 1}; invalid JSON falls back to the defaults
+    try:
+        rates = json.loads(getattr(doc, "log_sampling_rates", None) or "{}")
+        return {str(event): float(rate) for event, rate in rates.items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
@@ -0,0 +1,71 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import frappe
+
+from flexiattend.triggers.bot_settings import get_erp_settings
+from flexiattend.triggers.eligibility import is_employee_eligible
+
+BINDING_DOCTYPE = "FlexiAttend Chat Binding"
+# Redis hash of chat ID -> "<employee>|<token version>" ("" = not registered)
+BINDING_CACHE_KEY = "flexiattend:tg:chat_binding"
+
+
+def get_bound_employee(chat_id):
+    """Employee registered for the chat, if the binding is from the current site token and still eligible"""
+    cache = frappe.cache()
+    key = cache.make_key(BINDING_CACHE_KEY)
+    chat_id = str(chat_id)
+    value = cache.hmget(key, [chat_id])[0]
+    if value is None:
+        row = frappe.db.get_value(BINDING_DOCTYPE, chat_id, ["employee", "token_version"], as_dict=True)
+        value = f"{row.employee}|{row.token_version or 0}" if row else ""
+        cache.pipeline().hset(key, chat_id, value).execute()
+    elif isinstance(value, bytes):
+        value = value.decode()
+
+    if not value:
+        return None
+    employee, version = value.rsplit("|", 1)
+    # Rotating the site token bumps the version, which retires every older binding at once
+    if int(version) != get_erp_settings()["SITE_TOKEN_VERSION"] or not is_employee_eligible(employee):
+        return None
+    return employee
+
+
+def get_employee_chats(employee):
+    """Chat IDs registered for the employee under the current site token"""
+    return frappe.get_all(
+        BINDING_DOCTYPE,
+        filters={"employee": employee, "token_version": get_erp_settings()["SITE_TOKEN_VERSION"]},
+        pluck="name"
+    )
+
+
+def bind_chat(chat_id, employee, telegram_user_id=None):
+    """Register the chat to the employee under the current site token"""
+    chat_id = str(chat_id)
+    values = {
+        "employee": employee,
+        "telegram_user_id": str(telegram_user_id or ""),
+        "token_version": get_erp_settings()["SITE_TOKEN_VERSION"]
+    }
+    if frappe.db.exists(BINDING_DOCTYPE, chat_id):
+        frappe.db.set_value(BINDING_DOCTYPE, chat_id, values)
+    else:
+        frappe.get_doc({"doctype": BINDING_DOCTYPE, "chat_id": chat_id, **values}).insert(ignore_permissions=True)
+    frappe.db.commit()
+    clear_chat_binding_cache(chat_id)
+
+
+def unbind_chat(chat_id):
+    chat_id = str(chat_id)
+    if frappe.db.exists(BINDING_DOCTYPE, chat_id):
+        frappe.delete_doc(BINDING_DOCTYPE, chat_id, ignore_permissions=True, force=True)
+        frappe.db.commit()
+    clear_chat_binding_cache(chat_id)
+
+
+def clear_chat_binding_cache(chat_id):
+    cache = frappe.cache()
+    cache.pipeline().hdel(cache.make_key(BINDING_CACHE_KEY), str(chat_id)).execute()
@@ -0,0 +1,269 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import json
+from contextlib import contextmanager
+
+import frappe
+from frappe import _
+
+from flexiattend.triggers.attachments import (
+    ATTACHMENT_STATUS_FIELD,
+    PENDING,
+    InvalidAttachmentError,
+    decode_attachments,
+    stage_files,
+)
+from flexiattend.triggers.bot_settings import get_erp_settings
+from flexiattend.triggers.eligibility import get_employee_eligibility, is_employee_eligible
+from flexiattend.triggers.geofence import OUTSIDE, OutsideWorkSiteError, check_punch
+from flexiattend.triggers.punch_state import (
+    InvalidPunchSequenceError,
+    suggest_next_log_type,
+    validate_punch_sequence,
+)
+
+# Number of check-ins inserted per transaction by the bulk endpoint
+BULK_CHECKIN_BATCH_SIZE = 100
+# Longest check-in list accepted by one bulk request
+MAX_BULK_CHECKINS = 500
+
+# Cached response of a check-in created with an idempotency key
+IDEMPOTENCY_CACHE_KEY = "flexiattend:checkin_idempotency:{0}"
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_FIELD = "custom_flexiattend_idempotency_key"
+
+
+def validate_employee(employee_id=None, suggest_log_type=False):
+    """Validate Employee exists by document name and status
+
+    ``suggest_log_type`` adds the employee's expected next punch. Only the bot
+    asks for it in process; the guest endpoint never exposes punch history.
+    """
+    if not employee_id:
+        return {"status": "error", "message": _("Employee ID missing")}
+
+    # Use exact document name, answered from the eligibility cache
+    if not is_employee_eligible(employee_id):
+        return {"status": "error", "message": _("Invalid Employee ID")}
+
+    response = {"status": "success", "message": _(f"Employee {employee_id} exists")}
+    if suggest_log_type:
+        # Lets the bot preselect Check-In / Check-Out
+        response["next_log_type"] = suggest_next_log_type(employee_id)
+    return response
+
+
+def create_checkin(employee_id, log_type, latitude=None, longitude=None, attachments=None, files=None, idempotency_key=None):
+    """Create and commit an Employee Checkin
+
+    ``files`` is a list of ``(filename, bytes or file-like)`` and ``attachments``
+    the legacy list of base64 encoded ``{"filename", "filedata"}`` dicts.
+    A repeated ``idempotency_key`` returns the original check-in untouched.
+    """
+    if idempotency_key:
+        replay = get_idempotent_response(idempotency_key)
+        if replay:
+            return replay
+
+    if not is_employee_eligible(employee_id):
+        return {"status": "error", "message": _("Invalid Employee ID")}
+
+    try:
+        checkin = _insert_checkin(employee_id, log_type, latitude, longitude, attachments, files, idempotency_key)
+    except (OutsideWorkSiteError, InvalidPunchSequenceError, InvalidAttachmentError) as e:
+        return {"status": "error", "message": str(e)}
+    except frappe.UniqueValidationError:
+        # A concurrent retry with the same key committed first
+        frappe.db.rollback()
+        frappe.clear_messages()
+        replay = idempotency_key and get_idempotent_response(idempotency_key)
+        if replay:
+            return replay
+        raise
+    frappe.db.commit()
+
+    response = _checkin_response(checkin)
+    if idempotency_key:
+        frappe.cache().set_value(IDEMPOTENCY_CACHE_KEY.format(idempotency_key), response, expires_in_sec=IDEMPOTENCY_TTL)
+    return response
+
+
+def get_idempotent_response(idempotency_key):
+    """Response of the check-in created earlier with this key, from cache or the unique index"""
+    response = frappe.cache().get_value(IDEMPOTENCY_CACHE_KEY.format(idempotency_key))
+    if response:
+        return response
+
+    checkin = frappe.db.get_value(
+        "Employee Checkin",
+        {IDEMPOTENCY_FIELD: idempotency_key},
+        ["name", "employee", "log_type", "latitude", "longitude"],
+        as_dict=True
+    )
+    if not checkin:
+        return None
+
+    response = _checkin_response(checkin)
+    frappe.cache().set_value(IDEMPOTENCY_CACHE_KEY.format(idempotency_key), response, expires_in_sec=IDEMPOTENCY_TTL)
+    return response
+
+
+def _checkin_response(checkin):
+    return {
+        "status": "success",
+        "message": f"{checkin.log_type} recorded for {checkin.employee} at {checkin.latitude}, {checkin.longitude}",
+        "checkin_id": checkin.name
+    }
+
+
+def create_checkins_bulk(checkins):
+    """Create many Employee Checkins in batches and return a result per item"""
+    if isinstance(checkins, str):
+        try:
+            checkins = json.loads(checkins)
+        except Exception:
+            return {"status": "error", "message": _("Invalid check-in list")}
+
+    if not isinstance(checkins, list):
+        return {"status": "error", "message": _("Invalid check-in list")}
+    if len(checkins) > MAX_BULK_CHECKINS:
+        return {"status": "error", "message": _("At most {0} check-ins per request").format(MAX_BULK_CHECKINS)}
+
+    # One set-based lookup for every employee in the request
+    employee_ids = {c.get("employee_id") for c in checkins if isinstance(c, dict) and c.get("employee_id")}
+    eligibility = get_employee_eligibility(employee_ids)
+    existing = {employee_id for employee_id, eligible in eligibility.items() if eligible}
+
+    results = []
+    # employee -> (log_type, time) of their latest punch in this request; the
+    # cached state only moves once the batch commits
+    last_punches = {}
+    for start in range(0, len(checkins), BULK_CHECKIN_BATCH_SIZE):
+        for index, item in enumerate(checkins[start:start + BULK_CHECKIN_BATCH_SIZE], start):
+            results.append(_insert_bulk_item(index, item, existing, last_punches))
+        frappe.db.commit()
+
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    return {
+        "status": "success" if succeeded == len(results) else "partial" if succeeded else "error",
+        "message": _("{0} of {1} check-ins recorded").format(succeeded, len(results)),
+        "results": results
+    }
+
+
+def _insert_bulk_item(index, item, existing, last_punches):
+    """Insert one item of a bulk request inside its own savepoint"""
+    if not isinstance(item, dict) or not item.get("employee_id") or not item.get("log_type"):
+        return {"index": index, "status": "error", "message": _("Employee ID and log type are required")}
+
+    idempotency_key = item.get("idempotency_key")
+    if idempotency_key:
+        replay = get_idempotent_response(idempotency_key)
+        if replay:
+            return {"index": index, "status": "success", "checkin_id": replay["checkin_id"]}
+
+    employee_id = item["employee_id"]
+    if employee_id not in existing:
+        return {"index": index, "status": "error", "message": _("Invalid Employee ID")}
+
+    savepoint = f"flexiattend_bulk_{index}"
+    frappe.db.savepoint(savepoint)
+    try:
+        with _after_commit_if_kept():
+            checkin = _insert_checkin(
+                employee_id,
+                item["log_type"],
+                item.get("latitude"),
+                item.get("longitude"),
+                item.get("attachments"),
+                idempotency_key=idempotency_key,
+                last_punch=last_punches.get(employee_id)
+            )
+            frappe.db.release_savepoint(savepoint)
+    except Exception as e:
+        # Roll back only this item, the rest of the batch still commits
+        frappe.db.rollback(save_point=savepoint)
+        frappe.clear_messages()
+        return {"index": index, "status": "error", "message": str(e)}
+
+    last_punches[employee_id] = (checkin.log_type, checkin.time)
+    return {"index": index, "status": "success", "checkin_id": checkin.name}
+
+
+class _CallbackBuffer(list):
+    add = list.append
+
+
+@contextmanager
+def _after_commit_if_kept():
+    """Hold the after_commit callbacks registered in the block (cache updates,
+    attachment jobs) and hand them on only if the block does not raise, so a
+    rolled-back item leaves nothing to run"""
+    after_commit = frappe.db.after_commit
+    held = frappe.db.after_commit = _CallbackBuffer()
+    try:
+        yield
+    finally:
+        frappe.db.after_commit = after_commit
+    for callback in held:
+        after_commit.add(callback)
+
+
+def _insert_checkin(employee_id, log_type, latitude=None, longitude=None, attachments=None, files=None,
+                    idempotency_key=None, last_punch=None):
+    """Insert an Employee Checkin and stage its attachments, without committing
+
+    ``last_punch`` is the employee's latest uncommitted ``(log_type, time)``,
+    checked instead of the cached state.
+    """
+    # Convert lat/lon to float
+    try:
+        latitude = float(latitude) if latitude else None
+        longitude = float(longitude) if longitude else None
+    except ValueError:
+        latitude = longitude = None
+
+    if get_erp_settings()["ENFORCE_PUNCH_SEQUENCE"]:
+        validate_punch_sequence(employee_id, log_type, last_punch=last_punch)
+    geofence_status, work_site, distance = _check_geofence(employee_id, latitude, longitude)
+    files = list(files or []) + (decode_attachments(attachments) if attachments else [])
+
+    checkin = frappe.get_doc({
+        "doctype": "Employee Checkin",
+        "employee": employee_id,
+        "log_type": log_type,
+        "time": frappe.utils.now_datetime(),
+        "device_id": "FlexiAttend",
+        "latitude": latitude,
+        "longitude": longitude,
+        IDEMPOTENCY_FIELD: idempotency_key or None,
+        "custom_flexiattend_geofence_status": geofence_status,
+        "custom_flexiattend_work_site": work_site,
+        "custom_flexiattend_work_site_distance": distance,
+        ATTACHMENT_STATUS_FIELD: PENDING if files else None
+    })
+    checkin.insert(ignore_permissions=True)
+
+    # File documents are created by a background job after commit, so the
+    # punch is acknowledged without waiting for attachment writes
+    if files:
+        stage_files(checkin.name, files)
+
+    return checkin
+
+
+def _check_geofence(employee_id, latitude, longitude):
+    """Return (status, work site, distance) or raise OutsideWorkSiteError in Reject mode"""
+    mode = get_erp_settings()["GEOFENCE_MODE"]
+    if mode == "Disabled" or latitude is None or longitude is None:
+        return None, None, None
+
+    status, work_site, distance = check_punch(employee_id, latitude, longitude)
+    if mode == "Reject" and status == OUTSIDE:
+        if not work_site:
+            raise OutsideWorkSiteError(_("You are far from all your work sites. Please check in from your work site."))
+        raise OutsideWorkSiteError(
+            _("You are {0} m away from {1}. Please check in from your work site.").format(int(distance), work_site)
+        )
+    return status, work_site, distance
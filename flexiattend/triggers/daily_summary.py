@@ -0,0 +1,171 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import itertools
+
+import frappe
+from frappe.utils import add_days, get_datetime, getdate, now, today
+
+SUMMARY_DOCTYPE = "FlexiAttend Daily Summary"
+DEVICE_ID = "FlexiAttend"
+# Days of punches loaded at a time by the rebuild
+REBUILD_WINDOW_DAYS = 7
+
+CHECKIN_FIELDS = ["employee", "time", "log_type", "latitude", "longitude", "custom_flexiattend_work_site"]
+SUMMARY_FIELDS = [
+    "punch_count", "first_in", "last_out", "worked_minutes",
+    "last_punch", "last_log_type", "last_latitude", "last_longitude", "last_work_site"
+]
+
+
+def summary_name(employee, attendance_date):
+    return f"{employee}-{getdate(attendance_date)}"
+
+
+def summarise(punches):
+    """Summary values of one employee-day from its punches in time order"""
+    first_in = next((p.time for p in punches if p.log_type == "IN"), None)
+    last_out = next((p.time for p in reversed(punches) if p.log_type == "OUT"), None)
+
+    # Pair every IN with the next OUT; a repeated IN keeps the earlier one open
+    worked_seconds = 0
+    opened = None
+    for punch in punches:
+        if punch.log_type == "IN":
+            opened = opened or get_datetime(punch.time)
+        elif punch.log_type == "OUT" and opened:
+            worked_seconds += (get_datetime(punch.time) - opened).total_seconds()
+            opened = None
+
+    last = punches[-1]
+    return {
+        "punch_count": len(punches),
+        "first_in": first_in,
+        "last_out": last_out,
+        "worked_minutes": int(worked_seconds // 60),
+        "last_punch": last.time,
+        "last_log_type": last.log_type,
+        "last_latitude": last.latitude,
+        "last_longitude": last.longitude,
+        "last_work_site": last.custom_flexiattend_work_site
+    }
+
+
+def refresh_summary(employee, attendance_date):
+    """Recompute one employee-day from its few punches and upsert the row"""
+    attendance_date = getdate(attendance_date)
+    name = summary_name(employee, attendance_date)
+    # Row lock: concurrent refreshes of the same day run one after another,
+    # and the later one sees every committed punch
+    exists = frappe.db.get_value(SUMMARY_DOCTYPE, name, "name", for_update=True)
+
+    punches = frappe.get_all(
+        "Employee Checkin",
+        filters={"employee": employee, "device_id": DEVICE_ID, "time": ["between", [attendance_date, attendance_date]]},
+        fields=CHECKIN_FIELDS,
+        order_by="time asc"
+    )
+    if not punches:
+        if exists:
+            frappe.db.delete(SUMMARY_DOCTYPE, {"name": name})
+        return
+
+    values = summarise(punches)
+    if exists:
+        frappe.db.set_value(SUMMARY_DOCTYPE, name, values)
+        return
+    try:
+        frappe.get_doc({
+            "doctype": SUMMARY_DOCTYPE,
+            "employee": employee,
+            "attendance_date": attendance_date,
+            **values
+        }).insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        # Created by a concurrent refresh since the lock read
+        frappe.db.set_value(SUMMARY_DOCTYPE, name, values)
+
+
+def rebuild_daily_summaries(from_date=None, to_date=None, employee=None):
+    """Backfill: recompute every summary in the range from Employee Checkin, a window of days at a time"""
+    checkin_filters = {"device_id": DEVICE_ID}
+    summary_filters = {}
+    if employee:
+        checkin_filters["employee"] = summary_filters["employee"] = employee
+
+    if not from_date:
+        first = frappe.get_all("Employee Checkin", filters=checkin_filters, fields=["min(time) as first"])
+        from_date = first[0].first if first and first[0].first else today()
+    from_date, to_date = getdate(from_date), getdate(to_date or today())
+
+    fields = ["name", "employee", "employee_name", "attendance_date", "creation", "modified", "owner", "modified_by"]
+    employee_names = {}
+    rebuilt = 0
+
+    window_start = from_date
+    while window_start <= to_date:
+        window_end = min(add_days(window_start, REBUILD_WINDOW_DAYS - 1), to_date)
+        frappe.db.delete(
+            SUMMARY_DOCTYPE, {**summary_filters, "attendance_date": ["between", [window_start, window_end]]}
+        )
+        punches = frappe.get_all(
+            "Employee Checkin",
+            filters={**checkin_filters, "time": ["between", [window_start, window_end]]},
+            fields=CHECKIN_FIELDS,
+            order_by="employee asc, time asc"
+        )
+        _load_employee_names(employee_names, {p.employee for p in punches})
+
+        timestamp = now()
+        rows = []
+        for (emp, day), day_punches in itertools.groupby(punches, key=lambda p: (p.employee, getdate(p.time))):
+            values = summarise(list(day_punches))
+            rows.append([
+                summary_name(emp, day), emp, employee_names.get(emp), day,
+                timestamp, timestamp, "Administrator", "Administrator",
+                *(values[field] for field in SUMMARY_FIELDS)
+            ])
+        if rows:
+            frappe.db.bulk_insert(SUMMARY_DOCTYPE, fields=fields + SUMMARY_FIELDS, values=rows)
+        frappe.db.commit()
+        rebuilt += len(rows)
+        window_start = add_days(window_end, 1)
+
+    return rebuilt
+
+
+# ---- DOC EVENTS ---- #
+def on_checkin_insert(doc, method=None):
+    if doc.device_id == DEVICE_ID:
+        _refresh_after_commit(doc.employee, getdate(doc.time))
+
+
+def on_checkin_change(doc, method=None):
+    if doc.flags.in_insert:
+        return
+    # The punch may have moved to another day or employee, or off the FlexiAttend device
+    versions = [doc, doc.get_doc_before_save()]
+    days = {(d.employee, getdate(d.time)) for d in versions if d and d.device_id == DEVICE_ID}
+    for employee, attendance_date in days:
+        _refresh_after_commit(employee, attendance_date)
+
+
+# ---- HELPERS ---- #
+def _refresh_after_commit(employee, attendance_date):
+    def refresh():
+        try:
+            refresh_summary(employee, attendance_date)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=f"FlexiAttend: daily summary of {employee} on {attendance_date}")
+
+    frappe.db.after_commit.add(refresh)
+
+
+def _load_employee_names(employee_names, employee_ids):
+    missing = [e for e in employee_ids if e not in employee_names]
+    if missing:
+        employee_names.update(
+            frappe.get_all("Employee", filters={"name": ["in", missing]}, fields=["name", "employee_name"], as_list=True)
+        )
@@ -0,0 +1,188 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import frappe
+
+# Redis hash of employee ID -> "1" (eligible) / "0" (inactive or not enrolled)
+ELIGIBILITY_CACHE_KEY = "flexiattend:employee_eligibility"
+# Random stamp changed on every invalidation so other processes drop their local copy
+ELIGIBILITY_VERSION_KEY = "flexiattend:employee_eligibility_version"
+# IDs with no Employee at all are remembered in expiring keys of their own, so
+# guessed IDs sent to the guest endpoints cannot grow the hash without bound
+UNKNOWN_EMPLOYEE_KEY = "flexiattend:unknown_employee:{0}"
+UNKNOWN_EMPLOYEE_TTL = 10 * 60
+
+# Writes the hash only while the version stamp is the one read before the DB
+# query, so a row loaded before an invalidation is never cached after it
+_STORE_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# In-process copy of the Redis hash per site, valid only while the version stamp matches
+_local_cache = {}
+
+
+def is_employee_eligible(employee_id):
+    """Return True if the employee is Active and enrolled in FlexiAttend"""
+    if not employee_id:
+        return False
+    return get_employee_eligibility([employee_id])[employee_id]
+
+
+def get_employee_eligibility(employee_ids):
+    """Return {employee_id: bool} using the in-process cache, then Redis, then one DB query"""
+    entries = _get_local_entries()
+    result = {}
+    missing = []
+    for employee_id in set(employee_ids):
+        if employee_id in entries:
+            result[employee_id] = entries[employee_id]
+        else:
+            missing.append(employee_id)
+
+    if missing:
+        cache = frappe.cache()
+        cached = cache.hmget(cache.make_key(ELIGIBILITY_CACHE_KEY), missing)
+        not_cached = []
+        for employee_id, value in zip(missing, cached, strict=True):
+            if value is None:
+                not_cached.append(employee_id)
+            else:
+                result[employee_id] = entries[employee_id] = value == b"1"
+
+        unknown = _get_unknown(not_cached)
+        not_cached = [employee_id for employee_id in not_cached if employee_id not in unknown]
+        result.update(dict.fromkeys(unknown, False))
+
+        if not_cached:
+            version = _get_version()
+            loaded = _load_eligibility(not_cached)
+            _store(loaded, version)
+            _store_unknown([employee_id for employee_id, eligible in loaded.items() if eligible is None])
+            for employee_id, eligible in loaded.items():
+                result[employee_id] = bool(eligible)
+                # Unknown IDs stay out of the in-process copy as well
+                if eligible is not None:
+                    entries[employee_id] = eligible
+
+    return result
+
+
+def warm_eligibility_cache(employee_ids=None):
+    """Fill the Redis cache for all (or the given) employees from a single query"""
+    filters = {"name": ["in", list(employee_ids)]} if employee_ids else {}
+    version = _get_version()
+    rows = frappe.get_all(
+        "Employee",
+        filters=filters,
+        fields=["name", "status", "custom_add_employee_to_flexiattend"]
+    )
+    loaded = {row.name: _is_eligible(row) for row in rows}
+
+    _store(loaded, version)
+    _bump_version()
+    return len(loaded)
+
+
+def clear_eligibility_cache(employee_ids=None):
+    """Drop cached eligibility for the given employees, or for everyone"""
+    cache = frappe.cache()
+    # Stamp first: a reader that loaded the old row either sees the new stamp
+    # and skips its write, or wrote before it and is removed below
+    _bump_version()
+    if employee_ids:
+        pipe = cache.pipeline()
+        pipe.hdel(cache.make_key(ELIGIBILITY_CACHE_KEY), *employee_ids)
+        # A new Employee may reuse an ID that was looked up before
+        pipe.delete(*(cache.make_key(UNKNOWN_EMPLOYEE_KEY.format(e)) for e in employee_ids))
+        pipe.execute()
+    else:
+        cache.delete_value(ELIGIBILITY_CACHE_KEY)
+
+
+# ---- DOC EVENTS ---- #
+# Cleared once the change commits: clearing earlier lets a concurrent reader
+# cache the old status again, and entries have no expiry
+def on_employee_update(doc, method=None):
+    employee_ids = [doc.name]
+    frappe.db.after_commit.add(lambda: clear_eligibility_cache(employee_ids))
+
+
+def on_employee_rename(doc, method=None, old=None, new=None, merge=False):
+    employee_ids = [name for name in (old, new) if name]
+    frappe.db.after_commit.add(lambda: clear_eligibility_cache(employee_ids))
+
+
+# ---- HELPERS ---- #
+def _is_eligible(row):
+    return row.status == "Active" and bool(row.custom_add_employee_to_flexiattend)
+
+
+def _load_eligibility(employee_ids):
+    rows = frappe.get_all(
+        "Employee",
+        filters={"name": ["in", employee_ids]},
+        fields=["name", "status", "custom_add_employee_to_flexiattend"]
+    )
+    loaded = dict.fromkeys(employee_ids)  # None: no such Employee
+    loaded.update({row.name: _is_eligible(row) for row in rows})
+    return loaded
+
+
+def _get_version():
+    # Raw bytes, as compared by _STORE_SCRIPT; not the request-memoised get_value
+    cache = frappe.cache()
+    return cache.get(cache.make_key(ELIGIBILITY_VERSION_KEY)) or b""
+
+
+def _store(eligibility, version):
+    args = [version]
+    for employee_id, eligible in eligibility.items():
+        if eligible is not None:
+            args += [employee_id, "1" if eligible else "0"]
+    if len(args) == 1:
+        return
+    cache = frappe.cache()
+    store = cache.register_script(_STORE_SCRIPT)
+    store(keys=[cache.make_key(ELIGIBILITY_VERSION_KEY), cache.make_key(ELIGIBILITY_CACHE_KEY)], args=args)
+
+
+def _get_unknown(employee_ids):
+    if not employee_ids:
+        return set()
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    for employee_id in employee_ids:
+        pipe.exists(cache.make_key(UNKNOWN_EMPLOYEE_KEY.format(employee_id)))
+    return {employee_id for employee_id, found in zip(employee_ids, pipe.execute(), strict=True) if found}
+
+
+def _store_unknown(employee_ids):
+    if not employee_ids:
+        return
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    for employee_id in employee_ids:
+        pipe.set(cache.make_key(UNKNOWN_EMPLOYEE_KEY.format(employee_id)), 1, ex=UNKNOWN_EMPLOYEE_TTL)
+    pipe.execute()
+
+
+def _get_local_entries():
+    # get_value is memoised per request, so this costs at most one Redis read per request
+    version = frappe.cache().get_value(ELIGIBILITY_VERSION_KEY)
+    site_cache = _local_cache.setdefault(frappe.local.site, {"version": None, "entries": {}})
+    if site_cache["version"] != version:
+        site_cache["version"] = version
+        site_cache["entries"] = {}
+    return site_cache["entries"]
+
+
+def _bump_version():
+    _local_cache.pop(frappe.local.site, None)
+    frappe.cache().set_value(ELIGIBILITY_VERSION_KEY, frappe.generate_hash(length=10))
@@ -0,0 +1,75 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+
+from flexiattend.triggers.eligibility import warm_eligibility_cache
+
+ENROLMENT_FIELD = "custom_add_employee_to_flexiattend"
+# Employees updated per statement and per commit
+ENROLMENT_CHUNK_SIZE = 500
+
+
+def queue_enrolment(enrol, department=None, branch=None, company=None):
+    """Enrol (or remove) every employee matching the filters in a background job"""
+    filters = _filters(enrol, department, branch, company)
+    job = frappe.enqueue(
+        "flexiattend.triggers.enrolment.apply_enrolment",
+        queue="long",
+        timeout=3600,
+        enrol=enrol,
+        filters=filters
+    )
+    action = _("Enrolment") if enrol else _("Removal")
+    return {
+        "status": "success",
+        "message": _("{0} of matching employees has been queued").format(action),
+        "job_id": job.id if job else None
+    }
+
+
+def apply_enrolment(enrol, filters):
+    """Set the FlexiAttend flag with one UPDATE per chunk, without Employee document hooks"""
+    value = 1 if enrol else 0
+    # Only rows that actually change are touched
+    employee_ids = frappe.get_all(
+        "Employee",
+        filters={**filters, ENROLMENT_FIELD: ["!=", value]},
+        pluck="name",
+        order_by="name"
+    )
+    title = _("FlexiAttend Enrolment") if enrol else _("FlexiAttend Removal")
+    total = len(employee_ids)
+
+    for start in range(0, total, ENROLMENT_CHUNK_SIZE):
+        chunk = employee_ids[start:start + ENROLMENT_CHUNK_SIZE]
+        frappe.db.set_value("Employee", {"name": ["in", chunk]}, ENROLMENT_FIELD, value)
+        frappe.db.commit()
+        done = start + len(chunk)
+        frappe.publish_progress(
+            done * 100 / total,
+            title=title,
+            description=_("{0} of {1} employees updated").format(done, total)
+        )
+
+    # One query refreshes the cached eligibility of every changed employee
+    if employee_ids:
+        warm_eligibility_cache(employee_ids)
+    return total
+
+
+def _filters(enrol, department, branch, company):
+    filters = {}
+    if department:
+        filters["department"] = department
+    if branch:
+        filters["branch"] = branch
+    if company:
+        filters["company"] = company
+    if not filters:
+        frappe.throw(_("Select a Department, Branch or Company"))
+    if enrol:
+        # Employees who left are never enrolled
+        filters["status"] = "Active"
+    return filters
@@ -0,0 +1,159 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+# Export of FlexiAttend check-ins for payroll and audit. Rows come from one
+# query over an unbuffered (server-side) cursor, with the check-in's File rows
+# LEFT JOINed and folded back into one record per check-in, and are written to
+# a temporary file that is then streamed to the client. Memory stays flat
+# whatever the date range; only Parquet holds one row group at a time.
+
+import csv
+import io
+import itertools
+import json
+import tempfile
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, getdate
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+DEVICE_ID = "FlexiAttend"
+# Check-ins per Parquet row group
+CHUNK_SIZE = 5000
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet"
+}
+COLUMNS = [
+    "checkin", "employee", "employee_name", "department", "branch", "company",
+    "log_type", "time", "latitude", "longitude", "work_site", "attachment_status"
+]
+ATTACHMENT_COLUMNS = ["file_url", "file_name", "file_size", "is_private"]
+
+
+def export_checkins(from_date, to_date, file_format="csv", employee=None, department=None, branch=None,
+                    company=None, log_type=None):
+    """Response streaming every FlexiAttend check-in in the date range that matches the filters"""
+    file_format = (file_format or "csv").lower()
+    if file_format not in FORMATS:
+        frappe.throw(_("Export format must be one of {0}").format(", ".join(FORMATS)))
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    if from_date > to_date:
+        frappe.throw(_("From Date must be before To Date"))
+    writer = {"csv": _write_csv, "ndjson": _write_ndjson, "parquet": _write_parquet}[file_format]
+    if file_format == "parquet":
+        _import_pyarrow()
+
+    spool = tempfile.TemporaryFile()
+    query, values = _query(from_date, to_date, employee, department, branch, company, log_type)
+    # No other query may run on the connection until the cursor is exhausted
+    with frappe.db.unbuffered_cursor():
+        rows = frappe.db.sql(query, values, as_dict=True, as_iterator=True)
+        writer(spool, _fold_attachments(rows))
+    spool.seek(0)
+
+    filename = f"flexiattend_checkins_{from_date}_{to_date}.{file_format}"
+    response = Response(
+        wrap_file(frappe.local.request.environ, spool),
+        content_type=FORMATS[file_format],
+        direct_passthrough=True
+    )
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ---- QUERY ---- #
+def _query(from_date, to_date, employee, department, branch, company, log_type):
+    conditions = ["c.device_id = %(device_id)s", "c.time >= %(from_date)s", "c.time < %(to_date)s"]
+    values = {"device_id": DEVICE_ID, "from_date": from_date, "to_date": add_days(to_date, 1)}
+    for column, value in (
+        ("c.employee", employee), ("emp.department", department), ("emp.branch", branch),
+        ("emp.company", company), ("c.log_type", log_type)
+    ):
+        if value:
+            key = column.split(".")[1]
+            conditions.append(f"{column} = %({key})s")
+            values[key] = value
+
+    query = f"""
+        select
+            c.name as checkin, c.employee, c.employee_name, emp.department, emp.branch, emp.company,
+            c.log_type, c.time, c.latitude, c.longitude, c.custom_flexiattend_work_site as work_site,
+            c.custom_flexiattend_attachment_status as attachment_status,
+            f.file_url, f.file_name, f.file_size, f.is_private
+        from `tabEmployee Checkin` c
+        left join `tabEmployee` emp on emp.name = c.employee
+        left join `tabFile` f
+            on f.attached_to_doctype = 'Employee Checkin' and f.attached_to_name = c.name
+        where {" and ".join(conditions)}
+        order by c.time, c.name, f.creation
+    """
+    return query, values
+
+
+def _fold_attachments(rows):
+    """One record per check-in with its File rows as a list, from rows ordered by check-in"""
+    for _checkin, group in itertools.groupby(rows, key=lambda row: row["checkin"]):
+        group = list(group)
+        record = {column: group[0][column] for column in COLUMNS}
+        for column in ("latitude", "longitude"):
+            if record[column] is not None:
+                record[column] = float(record[column])
+        record["attachments"] = [
+            {column: row[column] for column in ATTACHMENT_COLUMNS} for row in group if row["file_url"]
+        ]
+        yield record
+
+
+# ---- WRITERS ---- #
+def _write_csv(spool, records):
+    text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow([*COLUMNS, "attachment_urls"])
+    for record in records:
+        writer.writerow([
+            *(record[column] for column in COLUMNS),
+            "\n".join(attachment["file_url"] for attachment in record["attachments"])
+        ])
+    text.flush()
+    # Keep the binary file open for the response
+    text.detach()
+
+
+def _write_ndjson(spool, records):
+    for record in records:
+        spool.write(json.dumps(record, default=str).encode() + b"\n")
+    spool.flush()
+
+
+def _write_parquet(spool, records):
+    pa, pq = _import_pyarrow()
+    attachment_type = pa.struct([
+        ("file_url", pa.string()), ("file_name", pa.string()), ("file_size", pa.int64()), ("is_private", pa.bool_())
+    ])
+    schema = pa.schema([
+        *((column, pa.string()) for column in COLUMNS if column not in ("time", "latitude", "longitude")),
+        ("time", pa.timestamp("us")),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("attachments", pa.list_(attachment_type))
+    ])
+    with pq.ParquetWriter(spool, schema) as writer:
+        while chunk := list(itertools.islice(records, CHUNK_SIZE)):
+            for record in chunk:
+                for attachment in record["attachments"]:
+                    attachment["is_private"] = bool(attachment["is_private"])
+            writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        frappe.throw(_("Parquet export needs the pyarrow package installed on the server"))
+    return pyarrow, pyarrow.parquet
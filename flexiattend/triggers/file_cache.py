@@ -0,0 +1,105 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+# Local disk cache of files downloaded from Telegram, keyed by file_unique_id
+# (stable for the same content, unlike file_id). A hit refreshes the file's
+# mtime, and eviction removes the least recently used files first once the
+# folder grows past the configured size. Writers keep a running size of the
+# folder in Redis, so the folder is only scanned once that passes the limit.
+
+import os
+import re
+import tempfile
+
+import frappe
+
+from flexiattend.triggers.bot_settings import get_erp_settings
+
+CACHE_FOLDER = "flexiattend_download_cache"
+# Size of the folder found by the last scan plus every write since. Files
+# overwritten or removed by hand make it an overestimate, which only brings
+# the next scan forward; the scan stores the exact size again.
+SIZE_KEY = "flexiattend:download_cache_bytes"
+# Evict down to this share of the limit so the next scan is a good many writes away
+EVICT_TO = 0.8
+
+_valid_id = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def get_cached_file(file_unique_id):
+    """Bytes of a previously downloaded file, or None"""
+    path = _path(file_unique_id)
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+        os.utime(path)
+    except OSError:
+        # Never cached, or evicted by another process meanwhile
+        return None
+    return content
+
+
+def cache_file(file_unique_id, content):
+    """Store a downloaded file; writes are atomic, readers see the whole file or nothing"""
+    limit = _limit_bytes()
+    path = _path(file_unique_id)
+    if not path or not limit or len(content) > limit:
+        return
+
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return
+
+    cache = frappe.cache()
+    size = cache.incrby(cache.make_key(SIZE_KEY), len(content))
+    # A new key (first write, or Redis was flushed) knows nothing of the files already there
+    if size > limit or size == len(content):
+        _evict(folder, limit)
+
+
+def _evict(folder, limit):
+    """Measure the folder, remove the least recently used files if it is too big, and store its size"""
+    entries = []
+    total = 0
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name.startswith(".tmp-"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    if total > limit:
+        for _mtime, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            if total <= limit * EVICT_TO:
+                break
+
+    cache = frappe.cache()
+    cache.set(cache.make_key(SIZE_KEY), total)
+
+
+def _path(file_unique_id):
+    if not file_unique_id or not _valid_id.match(file_unique_id):
+        return None
+    return frappe.get_site_path("private", CACHE_FOLDER, file_unique_id)
+
+
+def _limit_bytes():
+    return max(int(get_erp_settings()["DOWNLOAD_CACHE_MB"]), 0) * 1024 * 1024
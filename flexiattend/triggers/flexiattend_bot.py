@@ -659,81 +659,141 @@
 # For license information, please see license.txt
 
 from telegram import Update, Bot, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, BotCommand
+from telegram.request import HTTPXRequest
 import frappe
-import requests
 import asyncio
-import base64
 import json
+from contextlib import asynccontextmanager
 
-# ---- HELPER FUNCTIONS ---- #
-def get_erp_settings():
-    # Use guest session to prevent SessionStopped
-    frappe.set_user("Guest")
-    settings = frappe.get_single("FlexiAttend Settings")
-    return {
-        "BOT_TOKEN": settings.flexiattend_token,
-        "ERP_URL": settings.erpnext_base_url,
-        "SITE_TOKEN": settings.site_token,
-        "ENABLE_FLEXIATTEND": getattr(settings, "enable_flexiattend", False),
-        "MAX_ATTACHMENTS": getattr(settings, "maximum_file_attachments", 5),
-        "ATTACHMENT_ENABLED": getattr(settings, "enable_attachment_feature_in_employee_checkin", False)
-    }
+from flexiattend.triggers import checkin_service
+from flexiattend.triggers.bot_log import log_event
+from flexiattend.triggers.bot_settings import get_erp_settings, get_test_hook
+from flexiattend.triggers.chat_binding import bind_chat, get_bound_employee, unbind_chat
+from flexiattend.triggers.file_cache import cache_file, get_cached_file
+from flexiattend.triggers.metrics import count, flush_metrics, timer, track
+from flexiattend.triggers.outbound import OutboundBot
+from flexiattend.triggers.session_store import load_session, save_session
 
-settings = get_erp_settings()
-BOT_TOKEN = settings["BOT_TOKEN"]
-SITE_TOKEN = settings["SITE_TOKEN"]
-ENABLE_FLEXIATTEND = settings["ENABLE_FLEXIATTEND"]
-MAX_ATTACHMENTS = settings["MAX_ATTACHMENTS"]
-ATTACHMENT_ENABLED = settings["ATTACHMENT_ENABLED"]
-
-VALIDATE_EMP_ENDPOINT = f"{settings['ERP_URL']}/api/method/flexiattend.triggers.api.validate_employee"
-CREATE_CHECKIN_ENDPOINT = f"{settings['ERP_URL']}/api/method/flexiattend.triggers.api.create_employee_checkin"
+# ---- HELPER FUNCTIONS ---- #
+# Seconds a request waits for a free pooled connection
+BOT_POOL_TIMEOUT = 10
+
+@asynccontextmanager
+async def bot_session():
+    """Bot for the token in FlexiAttend Settings, closed on exit
+
+    Its httpx clients are bound to the event loop that first uses them, so
+    every asyncio.run needs its own Bot; never keep one across loops. The
+    bot's own user is never needed, so no get_me call is spent on setup.
+    """
+    settings = get_erp_settings()
+    # The default pool holds a single connection, which would serialise
+    # the concurrent downloads; one more is kept for replies
+    request = HTTPXRequest(connection_pool_size=download_concurrency() + 1, pool_timeout=BOT_POOL_TIMEOUT)
+    updates_request = HTTPXRequest(connection_pool_size=1)
+    bot = Bot(
+        settings["BOT_TOKEN"],
+        base_url=settings["BOT_API_URL"],
+        base_file_url=settings["BOT_FILE_URL"],
+        request=request,
+        get_updates_request=updates_request
+    )
+    try:
+        yield bot
+    finally:
+        await asyncio.gather(request.shutdown(), updates_request.shutdown())
 
-bot = Bot(BOT_TOKEN)
+def download_concurrency():
+    return max(1, min(int(get_erp_settings()["DOWNLOAD_CONCURRENCY"]), 10))
 
 # ---- CONVERSATION STATES ---- #
 SITE_VERIFICATION, EMPLOYEE_ID, MENU, LOCATION = range(4)
 
+LOG_TYPE_LABELS = {"IN": "Check-In", "OUT": "Check-Out"}
+SWITCH_LOG_TYPE_TEXTS = {f"Switch to {label}" for label in LOG_TYPE_LABELS.values()}
+
+# ---- CHECK-IN SERVICE CLIENT ---- #
+# Every entry point (webhook jobs, polling lanes) runs inside the site, so the
+# service is called in-process rather than over HTTP
+@track("external_call")
+def call_validate_employee(emp_id):
+    return checkin_service.validate_employee(emp_id, suggest_log_type=True)
+
+@track("external_call")
+def call_create_checkin(payload, files):
+    """files is a list of (file_name, bytes)"""
+    return checkin_service.create_checkin(files=files, **payload)
+
 # ---- DUMMY CONTEXT ---- #
 class DummyContext:
-    def __init__(self, bot):
+    def __init__(self, bot, user_data=None):
         self.bot = bot
-        self.user_data = {}
+        self.user_data = user_data if user_data is not None else {}
 
 # ---- HANDLER FUNCTIONS ---- #
+@track("handler")
 async def verify_site(update, context, user_data):
+    # Registered chats go straight to the punch
+    employee = get_bound_employee(update.message.chat.id)
+    if employee:
+        user_data.clear()
+        user_data['employee_id'] = employee
+        try:
+            resp = call_validate_employee(employee)
+        except Exception:
+            resp = {}
+        if resp.get("status") == "success":
+            count("registered_chat_start")
+            await offer_punch(update, context, user_data, resp, f"👋 Welcome back, {employee}.")
+            return
+
     await context.bot.send_message(update.message.chat.id, 
                                    "Enter your site token to verify your site:", 
                                    reply_markup=ReplyKeyboardRemove())
     user_data['state'] = SITE_VERIFICATION
 
+@track("handler")
 async def check_site_code(update, context, user_data):
     code = update.message.text.strip()
-    if code != SITE_TOKEN:
+    if code != get_erp_settings()["SITE_TOKEN"]:
+        count("invalid_site_code")
         await context.bot.send_message(update.message.chat.id, "❌ Invalid site code. Try again:")
         return
     await context.bot.send_message(update.message.chat.id, "✅ Site verified! Please enter your Employee ID:")
     user_data['state'] = EMPLOYEE_ID
 
+@track("handler")
 async def get_employee_id(update, context, user_data):
     emp_id = update.message.text.strip()
     user_data['employee_id'] = emp_id
     try:
-        r = requests.post(VALIDATE_EMP_ENDPOINT, data={"employee_id": emp_id})
-        resp = r.json()
-        status = resp.get("status") or resp.get("message", {}).get("status")
-        if status != "success":
+        resp = call_validate_employee(emp_id)
+        if resp.get("status") != "success":
+            count("unknown_employee")
             await context.bot.send_message(update.message.chat.id, "❌ Employee not found. Enter again:")
             return
     except Exception as e:
         await context.bot.send_message(update.message.chat.id, f"⚠️ Error verifying employee: {str(e)}")
         return
 
+    # The next /start skips site and employee verification
+    bind_chat(update.message.chat.id, emp_id, update.message.from_user and update.message.from_user.id)
+    await offer_punch(update, context, user_data, resp, "✅ Employee verified.")
+
+async def offer_punch(update, context, user_data, resp, greeting):
+    # The server proposes the next logical punch, so the menu step is skipped
+    next_log_type = resp.get("next_log_type")
+    if next_log_type in LOG_TYPE_LABELS:
+        user_data['log_type'] = next_log_type
+        await ask_location(update, context, user_data, greeting)
+        return
+
     menu_keyboard = [["Check-In", "Check-Out"]]
     reply_markup = ReplyKeyboardMarkup(menu_keyboard, one_time_keyboard=True, resize_keyboard=True)
-    await context.bot.send_message(update.message.chat.id, "✅ Employee verified. Choose an option:", reply_markup=reply_markup)
+    await context.bot.send_message(update.message.chat.id, f"{greeting} Choose an option:", reply_markup=reply_markup)
     user_data['state'] = MENU
 
+@track("handler")
 async def menu_choice(update, context, user_data):
     choice = update.message.text
     if choice not in ["Check-In", "Check-Out"]:
@@ -746,9 +806,30 @@ async def menu_choice(update, context, user_data):
     await context.bot.send_message(update.message.chat.id, "Please share your location:", reply_markup=reply_markup)
     user_data['state'] = LOCATION
 
+async def ask_location(update, context, user_data, prefix=""):
+    """Ask for the location of the preselected punch, with a button to switch IN/OUT"""
+    log_type = user_data['log_type']
+    other = "OUT" if log_type == "IN" else "IN"
+    location_keyboard = [
+        [KeyboardButton("Share Location 📍", request_location=True)],
+        [KeyboardButton(f"Switch to {LOG_TYPE_LABELS[other]}")]
+    ]
+    reply_markup = ReplyKeyboardMarkup(location_keyboard, one_time_keyboard=True, resize_keyboard=True)
+    await context.bot.send_message(update.message.chat.id,
+                                   f"{prefix} Recording {LOG_TYPE_LABELS[log_type]}. Please share your location:".strip(),
+                                   reply_markup=reply_markup)
+    user_data['state'] = LOCATION
+
+@track("handler")
+async def switch_log_type(update, context, user_data):
+    user_data['log_type'] = "OUT" if user_data.get('log_type') == "IN" else "IN"
+    await ask_location(update, context, user_data)
+
 # ---- Attachments ---- #
+@track("handler")
 async def handle_attachments(update, context, user_data):
-    if not ATTACHMENT_ENABLED:
+    settings = get_erp_settings()
+    if not settings["ATTACHMENT_ENABLED"]:
         await context.bot.send_message(update.message.chat.id, "⚠️ Attachment feature is disabled. File will not be saved.")
         return
 
@@ -756,30 +837,70 @@ async def handle_attachments(update, context, user_data):
         user_data["attachments"] = []
 
     current_count = len(user_data["attachments"])
+    max_attachments = settings["MAX_ATTACHMENTS"]
 
     if update.message.document:
-        if current_count >= MAX_ATTACHMENTS:
-            await context.bot.send_message(update.message.chat.id, f"❌ Maximum {MAX_ATTACHMENTS} files allowed.")
+        if current_count >= max_attachments:
+            count("attachment_limit_hit")
+            await context.bot.send_message(update.message.chat.id, f"❌ Maximum {max_attachments} files allowed.")
             return
         doc = update.message.document
-        user_data["attachments"].append({"file_id": doc.file_id, "file_name": doc.file_name})
+        user_data["attachments"].append(
+            {"file_id": doc.file_id, "file_unique_id": doc.file_unique_id, "file_name": doc.file_name}
+        )
         await context.bot.send_message(update.message.chat.id, f"✅ Document '{doc.file_name}' received.")
         return
 
     elif update.message.photo:
-        if current_count >= MAX_ATTACHMENTS:
-            await context.bot.send_message(update.message.chat.id, f"❌ Maximum {MAX_ATTACHMENTS} photos allowed.")
+        if current_count >= max_attachments:
+            count("attachment_limit_hit")
+            await context.bot.send_message(update.message.chat.id, f"❌ Maximum {max_attachments} photos allowed.")
             return
-        file_id = update.message.photo[-1].file_id
+        photo = update.message.photo[-1]
         file_name = f"photo_{current_count+1}.jpg"
-        user_data["attachments"].append({"file_id": file_id, "file_name": file_name})
-        await context.bot.send_message(update.message.chat.id, f"✅ Photo received ({current_count+1}/{MAX_ATTACHMENTS})")
+        user_data["attachments"].append(
+            {"file_id": photo.file_id, "file_unique_id": photo.file_unique_id, "file_name": file_name}
+        )
+        await context.bot.send_message(update.message.chat.id, f"✅ Photo received ({current_count+1}/{max_attachments})")
         return
 
     else:
         await context.bot.send_message(update.message.chat.id, "❌ Unsupported attachment type.")
 
+async def download_attachments(bot, attachments):
+    """Download attachments concurrently, returns ([(file_name, bytes)], [failed file names])"""
+    settings = get_erp_settings()
+    semaphore = asyncio.Semaphore(download_concurrency())
+
+    async def fetch(att):
+        # Re-sent files and retried punches are served from the local cache
+        cached = get_cached_file(att.get("file_unique_id"))
+        if cached is not None:
+            count("download_cache_hit")
+            return cached
+        with timer("external_call", "telegram_getFile"):
+            file_obj = await bot.get_file(att["file_id"])
+        with timer("external_call", "telegram_download"):
+            content = bytes(await file_obj.download_as_bytearray())
+        cache_file(file_obj.file_unique_id, content)
+        return content
+
+    async def fetch_bounded(att):
+        async with semaphore:
+            return await asyncio.wait_for(fetch(att), timeout=settings["DOWNLOAD_TIMEOUT"])
+
+    results = await asyncio.gather(*(fetch_bounded(att) for att in attachments), return_exceptions=True)
+
+    downloaded, failed = [], []
+    for att, result in zip(attachments, results, strict=True):
+        if isinstance(result, BaseException):
+            failed.append(att["file_name"])
+        else:
+            downloaded.append((att["file_name"], result))
+    return downloaded, failed
+
 # ---- Location ---- #
+@track("handler")
 async def location_handler(update, context, user_data):
     if not update.message.location:
         await context.bot.send_message(update.message.chat.id, "❌ Please share your location using the button.")
@@ -791,31 +912,29 @@ async def location_handler(update, context, user_data):
     lon = update.message.location.longitude
     attachments = user_data.get("attachments", [])
 
-    encoded_attachments = []
-    for att in attachments:
-        file_obj = await context.bot.get_file(att["file_id"])
-        file_bytes = await file_obj.download_as_bytearray()
-        encoded_attachments.append({
-            "filename": att["file_name"],
-            "filedata": base64.b64encode(file_bytes).decode()
-        })
+    # Raw bytes, sent in-process or as multipart parts (no base64 inflation)
+    downloaded, failed = await download_attachments(context.bot, attachments)
+    for file_name in failed:
+        count("attachment_download_failed")
+        await context.bot.send_message(update.message.chat.id, f"⚠️ Could not download '{file_name}'. It will not be attached.")
 
     payload = {
         "employee_id": emp_id,
         "log_type": log_type,
         "latitude": lat,
         "longitude": lon,
-        "attachments": encoded_attachments
+        # Same location message -> same key, so retries never punch twice
+        "idempotency_key": f"tg:{update.message.chat.id}:{update.message.message_id}"
     }
 
     try:
-        r = requests.post(CREATE_CHECKIN_ENDPOINT, json=payload)
-        resp = r.json()
-        status = resp.get("status") or resp.get("message", {}).get("status")
-        message_text = resp.get("message") or resp.get("message", {}).get("message", "")
-        if status == "success":
+        resp = call_create_checkin(payload, downloaded)
+        message_text = resp.get("message", "")
+        if resp.get("status") == "success":
+            count("checkin_recorded")
             await context.bot.send_message(update.message.chat.id, f"✅ {message_text}", reply_markup=ReplyKeyboardRemove())
         else:
+            count("checkin_rejected")
             await context.bot.send_message(update.message.chat.id, f"❌ Failed: {message_text}", reply_markup=ReplyKeyboardRemove())
     except Exception as e:
         await context.bot.send_message(update.message.chat.id, f"⚠️ Error: {str(e)}", reply_markup=ReplyKeyboardRemove())
@@ -823,11 +942,20 @@ async def location_handler(update, context, user_data):
     user_data.clear()
 
 # ---- Cancel ---- #
+@track("handler")
 async def cancel(update, context, user_data):
     await context.bot.send_message(update.message.chat.id, "❌ Operation cancelled. You can start again with /start.", reply_markup=ReplyKeyboardRemove())
     user_data.clear()
 
+# ---- Unregister ---- #
+@track("handler")
+async def unregister(update, context, user_data):
+    unbind_chat(update.message.chat.id)
+    user_data.clear()
+    await context.bot.send_message(update.message.chat.id, "✅ This chat is no longer registered. Use /start to verify again.", reply_markup=ReplyKeyboardRemove())
+
 # ---- Ignore unexpected ---- #
+@track("handler")
 async def ignore_unexpected(update, context, user_data):
     if update.message and update.message.text != "/cancel":
         if user_data.get('log_type'):
@@ -835,32 +963,170 @@ async def ignore_unexpected(update, context, user_data):
         else:
             await context.bot.send_message(update.message.chat.id, "❌ Please use the buttons only.")
 
-import frappe
-from telegram import Bot, Update
-import json
-
+# ---- Routing ---- #
+async def dispatch(update, context, user_data):
+    """Route one update to its handler based on the conversation state"""
+    text = update.message.text
+    state = user_data.get('state')
+
+    if text == "/cancel":
+        return await cancel(update, context, user_data)
+    if text == "/start":
+        return await verify_site(update, context, user_data)
+    if text == "/unregister":
+        return await unregister(update, context, user_data)
+
+    if state == SITE_VERIFICATION and text:
+        return await check_site_code(update, context, user_data)
+    if state == EMPLOYEE_ID and text:
+        return await get_employee_id(update, context, user_data)
+    if state == MENU and text:
+        return await menu_choice(update, context, user_data)
+    if state == LOCATION:
+        if update.message.location:
+            return await location_handler(update, context, user_data)
+        if update.message.photo or update.message.document:
+            return await handle_attachments(update, context, user_data)
+        if text in SWITCH_LOG_TYPE_TEXTS:
+            return await switch_log_type(update, context, user_data)
+    return await ignore_unexpected(update, context, user_data)
+
+def process_update(update_json):
+    """Run the conversation step for one raw Telegram update on its own event loop"""
+    async def run():
+        async with bot_session() as bot:
+            await handle_update(bot, update_json)
+
+    asyncio.run(run())
+
+async def handle_update(bot, update_json):
+    """Run the conversation step for one raw Telegram update with ``bot``"""
+    update = Update.de_json(update_json, bot)
+    if not update.message:
+        return
+    # Conversation state survives between updates in the chat's session
+    session = load_session(update.message.chat.id)
+    # Replies go through the rate-limited dispatcher
+    context = DummyContext(OutboundBot(bot), session.data)
+    await dispatch(update, context, context.user_data)
+    if not save_session(session):
+        # Another worker saved the chat first; a race, not a failure
+        log_event("session_conflict", chat_id=session.chat_id, update_id=update.update_id)
+    flush_metrics()
+
+# ---- Per-chat update queue ---- #
+# Updates are queued per chat and drained by background jobs. Only one job
+# holds a chat's lock at a time, so a chat's updates are handled in order
+# while different chats are processed in parallel by the workers.
+CHAT_QUEUE_KEY = "flexiattend:tg:chat_queue:{0}"
+CHAT_LOCK_KEY = "flexiattend:tg:chat_lock:{0}"
+# Upper bound for handling one update; the lock expires if a worker dies
+CHAT_LOCK_TTL = 300
+# The lock holds a random token; only its owner may extend or release it,
+# so a job that outlived the TTL cannot touch the next owner's lock
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def enqueue_update(chat_id, raw_update):
+    frappe.cache().rpush(CHAT_QUEUE_KEY.format(chat_id), raw_update)
+    frappe.enqueue(
+        "flexiattend.triggers.flexiattend_bot.drain_chat_queue",
+        queue="short",
+        # Tests and the load test drain in the calling thread
+        now=bool(get_test_hook("process_inline")),
+        chat_id=chat_id
+    )
+
+def drain_chat_queue(chat_id):
+    """Process the queued updates of one chat in arrival order"""
+    cache = frappe.cache()
+    queue_key = CHAT_QUEUE_KEY.format(chat_id)
+    lock_key = cache.make_key(CHAT_LOCK_KEY.format(chat_id))
+
+    token = frappe.generate_hash(length=16)
+    release = cache.register_script(_RELEASE_LOCK_SCRIPT)
+
+    # Another job already draining this chat will pick up our update
+    while cache.set(lock_key, token, nx=True, ex=CHAT_LOCK_TTL):
+        try:
+            if cache.llen(queue_key):
+                asyncio.run(_drain_locked_queue(queue_key, lock_key, token))
+        finally:
+            release(keys=[lock_key], args=[token])
+
+        # An update pushed between the last pop and the unlock may have had
+        # its own job exit early on the lock, so check once more
+        if not cache.llen(queue_key):
+            break
+
+async def _drain_locked_queue(queue_key, lock_key, token):
+    """Handle every queued update with one Bot on one event loop"""
+    cache = frappe.cache()
+    extend = cache.register_script(_EXTEND_LOCK_SCRIPT)
+    async with bot_session() as bot:
+        while (raw_update := cache.lpop(queue_key)) is not None:
+            try:
+                await handle_update(bot, json.loads(raw_update))
+            except Exception:
+                frappe.log_error(title="FlexiAttend Bot")
+            if not extend(keys=[lock_key], args=[token, CHAT_LOCK_TTL]):
+                # The lock expired and another job owns the chat now
+                return
+
+# ---- Redelivery filter ---- #
+# Telegram update_ids increase per bot, so seen IDs are kept as bits in
+# fixed-size bitmap buckets: 8 KB per 65536 updates, each bucket expiring a
+# day after its last use (Telegram gives up redelivering well before that).
+SEEN_UPDATES_KEY = "flexiattend:tg:seen_updates:{0}:{1}"
+SEEN_UPDATES_BUCKET_SIZE = 65536
+SEEN_UPDATES_TTL = 24 * 60 * 60
+
+def is_duplicate_update(update_id):
+    """Mark update_id as seen and return True if it had been seen before"""
+    if update_id is None:
+        return False
+    cache = frappe.cache()
+    bot_id = (get_erp_settings()["BOT_TOKEN"] or "").split(":")[0]
+    bucket, offset = divmod(int(update_id), SEEN_UPDATES_BUCKET_SIZE)
+    key = cache.make_key(SEEN_UPDATES_KEY.format(bot_id, bucket))
+    # SETBIT returns the previous bit; both commands go in one round trip
+    seen, _ = cache.pipeline().setbit(key, offset, 1).expire(key, SEEN_UPDATES_TTL).execute()
+    return bool(seen)
+
+# ---- Webhook ---- #
 @frappe.whitelist(allow_guest=True)
 def webhook():
+    """Queue the update and acknowledge Telegram at once; processing runs in the background"""
     try:
         update_json = frappe.local.form_dict
-        # Keep only the message text and chat id for logging
-        log_payload = {
-            "chat_id": update_json.get("message", {}).get("chat", {}).get("id"),
-            "text": update_json.get("message", {}).get("text")
-        }
-        frappe.log_error(f"Webhook payload: {json.dumps(log_payload)}", "FlexiAttend Bot Debug")
-
-        # Initialize your bot
-        bot = Bot("8466502184:AAFcBkWBFm31dqy-1iTZoILnX3YO59v65Qo")
-
-        # Process Telegram update safely
-        update = Update.de_json(update_json, bot)
-        chat_id = update.message.chat.id
-        text = update.message.text
-
-        if text == "/start":
-            bot.send_message(chat_id=chat_id, text="Hello! FlexiAttend Bot started ✅")
-
+        # Redeliveries of a slow update cost a single cache round trip
+        if is_duplicate_update(update_json.get("update_id")):
+            log_event("duplicate_update", update_id=update_json.get("update_id"))
+            return "OK"
+
+        message = update_json.get("message") or {}
+        chat_id = message.get("chat", {}).get("id")
+        # Sampled and buffered; no message text, it may hold the site token
+        log_event(
+            "webhook_update",
+            update_id=update_json.get("update_id"),
+            chat_id=chat_id,
+            kind=next((k for k in ("text", "location", "photo", "document") if k in message), None)
+        )
+        if not chat_id:
+            return "Ignored"
+
+        enqueue_update(chat_id, frappe.request.get_data(as_text=True))
         return "OK"
     except Exception as e:
         # Log short error only
@@ -0,0 +1,252 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import json
+import math
+
+import frappe
+from frappe import _
+
+# Random stamp changed whenever a work site changes; each process rebuilds its index lazily
+GEOFENCE_VERSION_KEY = "flexiattend:geofence_index_version"
+
+# Grid cell size in degrees (~1.1 km of latitude). A site is bucketed into
+# every cell its bounding box touches; sites larger than MAX_CELLS_PER_SITE
+# cells are kept in a short "wide" list checked for every punch instead.
+GRID_CELL_DEGREES = 0.01
+MAX_CELLS_PER_SITE = 2500
+EARTH_RADIUS_M = 6371008.8
+METRES_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+# An Outside punch names its nearest allowed site. Employees allowed a few
+# sites get them all measured; otherwise the grid is searched in square rings
+# of cells around the punch, out to NEAREST_MAX_RINGS cells (~11 km), and a
+# punch farther than that from every allowed site names none.
+NEAREST_SCAN_SITES = 16
+NEAREST_MAX_RINGS = 10
+
+INSIDE = "Inside"
+OUTSIDE = "Outside"
+NO_WORK_SITE = "No Work Site"
+
+# site -> (version, GeofenceIndex)
+_local_index = {}
+
+
+class OutsideWorkSiteError(frappe.ValidationError):
+    pass
+
+
+class WorkSite:
+    __slots__ = ("bbox", "lat", "lat_rad", "lon", "lon_rad", "name", "polygon", "radius")
+
+    def __init__(self, name, latitude=None, longitude=None, radius=None, polygon=None):
+        self.name = name
+        self.polygon = polygon
+        if polygon:
+            lats = [p[0] for p in polygon]
+            lons = [p[1] for p in polygon]
+            self.bbox = (min(lats), min(lons), max(lats), max(lons))
+            # Polygon "centre" only used to report a distance when outside
+            latitude, longitude, radius = sum(lats) / len(lats), sum(lons) / len(lons), 0
+        else:
+            dlat = math.degrees(radius / EARTH_RADIUS_M)
+            dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+            self.bbox = (latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon)
+        self.lat, self.lon, self.radius = latitude, longitude, radius
+        self.lat_rad, self.lon_rad = math.radians(latitude), math.radians(longitude)
+
+    def distance(self, lat_rad, lon_rad, cos_lat):
+        """Haversine distance in metres from the site centre, with the punch's cos(lat) precomputed"""
+        a = math.sin((lat_rad - self.lat_rad) / 2) ** 2 + cos_lat * math.cos(self.lat_rad) * math.sin((lon_rad - self.lon_rad) / 2) ** 2
+        return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+    def contains(self, lat, lon, distance):
+        if not self.polygon:
+            return distance <= self.radius
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        # Ray casting on the (lat, lon) plane, fine at work-site scale
+        inside = False
+        points = self.polygon
+        j = len(points) - 1
+        for i in range(len(points)):
+            lat_i, lon_i = points[i]
+            lat_j, lon_j = points[j]
+            if (lat_i > lat) != (lat_j > lat) and lon < (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i:
+                inside = not inside
+            j = i
+        return inside
+
+
+class GeofenceIndex:
+    """Grid index of enabled work sites with their employee / branch assignments"""
+
+    def __init__(self, sites, assignments):
+        self.sites = {site.name: site for site in sites}
+        self.cells = {}
+        self.wide = []
+        # Sites with no assignment rows apply to everyone
+        self.global_sites = set(self.sites)
+        self.by_employee = {}
+        self.by_branch = {}
+
+        for row in assignments:
+            if row.parent not in self.sites:
+                continue
+            self.global_sites.discard(row.parent)
+            if row.employee:
+                self.by_employee.setdefault(row.employee, set()).add(row.parent)
+            if row.branch:
+                self.by_branch.setdefault(row.branch, set()).add(row.parent)
+
+        for site in sites:
+            min_lat, min_lon, max_lat, max_lon = site.bbox
+            lat_cells = range(_cell(min_lat), _cell(max_lat) + 1)
+            lon_cells = range(_cell(min_lon), _cell(max_lon) + 1)
+            if len(lat_cells) * len(lon_cells) > MAX_CELLS_PER_SITE:
+                self.wide.append(site)
+                continue
+            for x in lat_cells:
+                for y in lon_cells:
+                    self.cells.setdefault((x, y), []).append(site)
+
+    def allowed_sites(self, employee=None, branch=None):
+        return self.global_sites | self.by_employee.get(employee, set()) | self.by_branch.get(branch, set())
+
+    def check(self, latitude, longitude, employee=None, branch=None):
+        """Return (status, work site, distance in metres) for a punch"""
+        allowed = self.allowed_sites(employee, branch)
+        if not allowed:
+            return NO_WORK_SITE, None, None
+
+        lat_rad, lon_rad = math.radians(latitude), math.radians(longitude)
+        cos_lat = math.cos(lat_rad)
+        candidates = self.cells.get((_cell(latitude), _cell(longitude)), []) + self.wide
+        for site in candidates:
+            if site.name in allowed:
+                distance = site.distance(lat_rad, lon_rad, cos_lat)
+                if site.contains(latitude, longitude, distance):
+                    return INSIDE, site.name, round(distance, 1)
+
+        distance, name = self.nearest(latitude, longitude, allowed)
+        return OUTSIDE, name, round(distance, 1) if name else None
+
+    def nearest(self, latitude, longitude, allowed):
+        """(distance in metres, name) of the nearest allowed site centre, or (None, None)"""
+        lat_rad, lon_rad = math.radians(latitude), math.radians(longitude)
+        cos_lat = math.cos(lat_rad)
+        if len(allowed) <= NEAREST_SCAN_SITES or not self.cells:
+            sites = (self.sites[name] for name in allowed)
+            return min(((site.distance(lat_rad, lon_rad, cos_lat), site.name) for site in sites), default=(None, None))
+
+        best = min(
+            ((site.distance(lat_rad, lon_rad, cos_lat), site.name) for site in self.wide if site.name in allowed),
+            default=(math.inf, None)
+        )
+        # Shortest side of a cell anywhere in the search area, in metres
+        edge_lat = min(abs(latitude) + (NEAREST_MAX_RINGS + 1) * GRID_CELL_DEGREES, 89.9)
+        cell_metres = GRID_CELL_DEGREES * METRES_PER_DEGREE * math.cos(math.radians(edge_lat))
+        x, y = _cell(latitude), _cell(longitude)
+        seen = set()
+        for ring in range(NEAREST_MAX_RINGS + 1):
+            # A site not seen yet has its centre in this ring or beyond,
+            # so at least ring - 1 whole cells away
+            if best[0] <= (ring - 1) * cell_metres:
+                break
+            for cell in _ring(x, y, ring):
+                for site in self.cells.get(cell, ()):
+                    if site.name in allowed and site.name not in seen:
+                        seen.add(site.name)
+                        best = min(best, (site.distance(lat_rad, lon_rad, cos_lat), site.name))
+
+        if best[0] > NEAREST_MAX_RINGS * cell_metres:
+            return None, None
+        return best
+
+
+def check_punch(employee, latitude, longitude):
+    """Evaluate a punch against the employee's work sites"""
+    branch = frappe.get_cached_value("Employee", employee, "branch")
+    return get_geofence_index().check(latitude, longitude, employee, branch)
+
+
+def get_geofence_index():
+    """Per-process index, rebuilt only after a work site changes"""
+    version = frappe.cache().get_value(GEOFENCE_VERSION_KEY)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(GEOFENCE_VERSION_KEY, version)
+
+    cached = _local_index.get(frappe.local.site)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    index = _build_index()
+    _local_index[frappe.local.site] = (version, index)
+    return index
+
+
+def clear_geofence_index(doc=None, method=None):
+    """Retire the index of every process once the work-site change is committed"""
+    # Bumped earlier, another process could rebuild from the old rows and keep
+    # them under the new stamp
+    frappe.db.after_commit.add(_bump_geofence_version)
+
+
+def parse_polygon(polygon):
+    """Polygon JSON ``[[lat, lon], ...]`` as a list of float tuples"""
+    if not polygon:
+        return None
+    points = json.loads(polygon) if isinstance(polygon, str) else polygon
+    points = [(float(lat), float(lon)) for lat, lon in points]
+    if len(points) < 3:
+        frappe.throw(_("A polygon needs at least three points"))
+    return points
+
+
+def _build_index():
+    rows = frappe.get_all(
+        "FlexiAttend Work Site",
+        filters={"enabled": 1},
+        fields=["name", "shape", "latitude", "longitude", "radius", "polygon"]
+    )
+    sites = []
+    for row in rows:
+        try:
+            if row.shape == "Polygon":
+                sites.append(WorkSite(row.name, polygon=parse_polygon(row.polygon)))
+            else:
+                sites.append(WorkSite(row.name, row.latitude, row.longitude, row.radius or 0))
+        except Exception:
+            frappe.log_error(title=f"FlexiAttend: invalid work site {row.name}")
+
+    assignments = frappe.get_all(
+        "FlexiAttend Work Site Assignment",
+        filters={"parenttype": "FlexiAttend Work Site"},
+        fields=["parent", "employee", "branch"]
+    )
+    return GeofenceIndex(sites, assignments)
+
+
+def _bump_geofence_version():
+    _local_index.pop(frappe.local.site, None)
+    frappe.cache().set_value(GEOFENCE_VERSION_KEY, frappe.generate_hash(length=10))
+
+
+def _cell(degrees):
+    return math.floor(degrees / GRID_CELL_DEGREES)
+
+
+def _ring(x, y, radius):
+    """Cells exactly ``radius`` cells away from (x, y) in either direction"""
+    if not radius:
+        yield x, y
+        return
+    for dx in range(-radius, radius + 1):
+        yield x + dx, y - radius
+        yield x + dx, y + radius
+    for dy in range(-radius + 1, radius):
+        yield x - radius, y + dy
+        yield x + radius, y + dy
@@ -0,0 +1,111 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import hashlib
+import io
+import os
+
+import frappe
+from PIL import Image, ImageOps
+
+from flexiattend.triggers.bot_settings import get_erp_settings
+
+# Formats re-encoded in place; the extension, and so the file URL, never changes
+IMAGE_FORMATS = {"jpg": "JPEG", "jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+ORIGINAL_SIZE_FIELD = "custom_flexiattend_original_size"
+
+
+def queue_image_optimisation(files):
+    """Recompress the image Files among ``files`` in a background job once the check-in commits"""
+    # Files linked to an already optimised copy need nothing more
+    names = [f.name for f in files if _image_format(f.file_name) and not f.get(ORIGINAL_SIZE_FIELD)]
+    if not names or not get_erp_settings()["OPTIMISE_IMAGES"]:
+        return
+    frappe.enqueue(
+        "flexiattend.triggers.image_optimiser.optimise_images",
+        queue="long",
+        file_names=names,
+        enqueue_after_commit=True
+    )
+
+
+def optimise_images(file_names):
+    settings = get_erp_settings()
+    for file_name in file_names:
+        try:
+            optimise_image(file_name, settings["IMAGE_MAX_DIMENSION"], settings["IMAGE_QUALITY"])
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=f"FlexiAttend: could not optimise {file_name}")
+
+
+def optimise_image(file_name, max_dimension, quality):
+    """Downsize, re-encode and strip the metadata of one image File, keeping its URL"""
+    if not frappe.db.exists("File", file_name):
+        # The check-in was rolled back after the job was queued
+        return
+    file_doc = frappe.get_doc("File", file_name)
+    image_format = _image_format(file_doc.file_name)
+    if not image_format or file_doc.get(ORIGINAL_SIZE_FIELD):
+        return
+
+    path = file_doc.get_full_path()
+    with open(path, "rb") as f:
+        original = f.read()
+
+    stored = original
+    if not _shared_outside_checkins(file_doc):
+        optimised = recompress(original, image_format, max_dimension, quality)
+        if len(optimised) < len(original):
+            stored = optimised
+            # Readers never see a half written file
+            temp_path = f"{path}.flexiattend"
+            with open(temp_path, "wb") as f:
+                f.write(stored)
+            os.replace(temp_path, path)
+
+    # Every check-in File pointing at the same content shares the result
+    frappe.db.set_value(
+        "File",
+        {"file_url": file_doc.file_url, "attached_to_doctype": "Employee Checkin"},
+        {
+            ORIGINAL_SIZE_FIELD: len(original),
+            "file_size": len(stored),
+            "content_hash": hashlib.md5(stored).hexdigest()
+        },
+        update_modified=False
+    )
+
+
+def recompress(content, image_format, max_dimension, quality):
+    """Return ``content`` fitted into max_dimension x max_dimension and re-encoded without metadata"""
+    with Image.open(io.BytesIO(content)) as source:
+        # JPEG can decode straight at a reduced scale, which skips most of the work
+        source.draft("RGB", (max_dimension, max_dimension))
+        # Apply the EXIF orientation before the EXIF block is dropped
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((max_dimension, max_dimension))
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        options = {"optimize": True}
+        if image_format != "PNG":
+            options["quality"] = quality
+        # Nothing passes exif, icc_profile or pnginfo, so no metadata is written
+        output = io.BytesIO()
+        image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def _image_format(file_name):
+    extension = (file_name or "").rsplit(".", 1)[-1].lower()
+    return IMAGE_FORMATS.get(extension)
+
+
+def _shared_outside_checkins(file_doc):
+    # Frappe reuses the stored file for identical uploads; leave files other documents rely on alone
+    return frappe.db.exists(
+        "File",
+        {"file_url": file_doc.file_url, "attached_to_doctype": ["!=", "Employee Checkin"]}
+    )
@@ -0,0 +1,213 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+# Latency histograms, outcome counters and in-flight gauges for the bot and
+# the check-in API. Observations are summed in process and written to one
+# Redis hash in a single pipeline (after each request, job or update, or
+# every FLUSH_INTERVAL seconds), so every worker contributes to the same
+# series. Hash fields are the Prometheus series themselves, e.g.
+# flexiattend_handler_seconds_bucket{name="verify_site",le="0.1"}.
+# In-flight gauges are kept per process instead, in hashes that expire once
+# the process stops touching them, so a killed worker's calls drop out.
+
+import asyncio
+import functools
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import frappe
+
+METRICS_KEY = "flexiattend:metrics"
+IN_FLIGHT_KEY = "flexiattend:metrics_in_flight:{0}"
+# Longer than any timed call; refreshed whenever a call of the process starts or ends
+IN_FLIGHT_TTL = 600
+FLUSH_INTERVAL = 5
+
+# Upper bounds in seconds; +Inf is implied
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# kind of timed call -> help text of its histogram
+TIMED_KINDS = {
+    "handler": "Time spent in a bot conversation handler",
+    "external_call": "Time spent in a call to Telegram or the check-in service",
+    "endpoint": "Time spent in a whitelisted FlexiAttend API method"
+}
+# External calls run inside a handler or endpoint, so only the outer ones are gauged
+GAUGED_KINDS = {"handler", "endpoint"}
+OUTCOMES_METRIC = "flexiattend_outcomes_total"
+ERRORS_METRIC = "flexiattend_errors_total"
+IN_FLIGHT_METRIC = "flexiattend_in_flight"
+
+# site -> {field: increment}, flushed together
+_pending = {}
+_last_flush = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def timer(kind, name):
+    """Time the block into the histogram of ``kind``, counting it as in flight meanwhile"""
+    gauge = _series(IN_FLIGHT_METRIC, kind=kind, name=name) if kind in GAUGED_KINDS else None
+    # The gauge is written straight away, a buffered gauge would always read zero
+    if gauge:
+        _add_in_flight(gauge, 1)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        _add(_series(ERRORS_METRIC, kind=kind, name=name), 1)
+        raise
+    finally:
+        if gauge:
+            _add_in_flight(gauge, -1)
+        observe(kind, name, time.perf_counter() - started)
+
+
+def track(kind):
+    """Decorator timing a sync or async function under its own name"""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timer(kind, fn.__name__):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(kind, fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(kind, name, seconds):
+    metric = f"flexiattend_{kind}_seconds"
+    for bound in BUCKETS:
+        if seconds <= bound:
+            _add(_series(f"{metric}_bucket", name=name, le=bound), 1)
+    _add(_series(f"{metric}_bucket", name=name, le="+Inf"), 1)
+    _add(_series(f"{metric}_count", name=name), 1)
+    _add(_series(f"{metric}_sum", name=name), seconds)
+
+
+def count(outcome, amount=1):
+    """Count a business outcome such as an invalid site code"""
+    _add(_series(OUTCOMES_METRIC, outcome=outcome), amount)
+
+
+def flush_metrics(**kwargs):
+    """Write the pending observations of this site; used as after_request / after_job hook"""
+    site = getattr(frappe.local, "site", None)
+    with _lock:
+        pending = _pending.pop(site, None)
+        _last_flush[site] = time.monotonic()
+    if not pending:
+        return
+    try:
+        cache = frappe.cache()
+        key = cache.make_key(METRICS_KEY)
+        pipe = cache.pipeline()
+        for field, amount in pending.items():
+            if isinstance(amount, float):
+                pipe.hincrbyfloat(key, field, amount)
+            else:
+                pipe.hincrby(key, field, amount)
+        pipe.execute()
+    except Exception:
+        # Metrics must never break a punch
+        pass
+
+
+def render_metrics():
+    """All series in the Prometheus text exposition format"""
+    flush_metrics()
+    cache = frappe.cache()
+    # Native HGETALL; the wrapper's version would unpickle the values
+    raw = cache.pipeline().hgetall(cache.make_key(METRICS_KEY)).execute()[0]
+    series = [
+        (field.decode(), value.decode())
+        for field, value in raw.items()
+        # Written here by older releases, with no way to expire
+        if not field.startswith(IN_FLIGHT_METRIC.encode())
+    ]
+    series.extend(_read_in_flight(cache).items())
+    series.sort(key=lambda item: _sort_key(item[0]))
+
+    families = [
+        (f"flexiattend_{kind}_seconds", "histogram", help_text) for kind, help_text in TIMED_KINDS.items()
+    ] + [
+        (OUTCOMES_METRIC, "counter", "Bot and check-in outcomes"),
+        (ERRORS_METRIC, "counter", "Timed calls that raised an exception"),
+        (IN_FLIGHT_METRIC, "gauge", "Timed calls currently running")
+    ]
+    lines = []
+    for metric, metric_type, help_text in families:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        suffixes = ("_bucket{", "_sum{", "_count{") if metric_type == "histogram" else ("{",)
+        lines.extend(
+            f"{field} {value}"
+            for field, value in series
+            if any(field.startswith(metric + suffix) for suffix in suffixes)
+        )
+    return "\n".join(lines) + "\n"
+
+
+# ---- HELPERS ---- #
+def _series(metric, **labels):
+    rendered = ",".join(
+        f'{label}="{_escape(value)}"' for label, value in labels.items()
+    )
+    return f"{metric}{{{rendered}}}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _add(field, amount):
+    site = getattr(frappe.local, "site", None)
+    with _lock:
+        pending = _pending.setdefault(site, {})
+        pending[field] = pending.get(field, 0) + amount
+        due = time.monotonic() - _last_flush.setdefault(site, time.monotonic()) > FLUSH_INTERVAL
+    if due:
+        flush_metrics()
+
+
+def _sort_key(field):
+    """Series by name and labels, with the buckets of a histogram in ascending le and +Inf last"""
+    head, found, bound = field.rpartition(',le="')
+    if not found:
+        return field, 0.0
+    return head, float(bound.rstrip('"}'))
+
+
+def _add_in_flight(field, amount):
+    try:
+        cache = frappe.cache()
+        key = cache.make_key(IN_FLIGHT_KEY.format(f"{socket.gethostname()}:{os.getpid()}"))
+        pipe = cache.pipeline()
+        pipe.hincrby(key, field, amount)
+        pipe.expire(key, IN_FLIGHT_TTL)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def _read_in_flight(cache):
+    """In-flight gauges summed over the processes that are still alive"""
+    keys = list(cache.scan_iter(match=cache.make_key(IN_FLIGHT_KEY.format("*"))))
+    pipe = cache.pipeline()
+    for key in keys:
+        pipe.hgetall(key)
+    totals = {}
+    for raw in pipe.execute() if keys else ():
+        for field, value in raw.items():
+            field = field.decode()
+            totals[field] = totals.get(field, 0) + int(value)
+    return totals
@@ -0,0 +1,220 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+# Outbound Telegram messages. Every sender, in every worker, draws from the
+# same Redis token buckets: a global one for the bot and one per chat, kept
+# under Telegram's limits (about 30 messages/s overall, 1/s per chat).
+# Interactive replies may use the whole global bucket; bulk notifications
+# (such as attachments that could not be saved) are queued, sent by a
+# background job and leave RESERVED_TOKENS for replies.
+
+import asyncio
+import json
+import time
+
+import frappe
+
+from flexiattend.triggers.metrics import timer
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+GLOBAL_RATE = 25  # tokens per second
+GLOBAL_BURST = 30
+CHAT_RATE = 1
+CHAT_BURST = 3
+RESERVED_TOKENS = 10
+MAX_ATTEMPTS = 4
+
+BUCKET_KEY = "flexiattend:tg:outbound_bucket:{0}"
+# Unix time in ms until which nobody sends, set from a 429's retry_after
+PAUSE_KEY = "flexiattend:tg:outbound_pause"
+BULK_QUEUE_KEY = "flexiattend:tg:outbound_bulk"
+STATS_KEY = "flexiattend:tg:outbound_stats"
+
+# Takes a token from both buckets, or returns the milliseconds to wait first
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local pause = tonumber(redis.call('GET', KEYS[3]) or '0')
+if pause > now then
+    return pause - now
+end
+
+local function level(key, rate, burst)
+    local bucket = redis.call('HMGET', key, 't', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    return math.min(burst, tokens + math.max(0, now - updated) * rate / 1000)
+end
+
+local global_rate, chat_rate = tonumber(ARGV[2]), tonumber(ARGV[4])
+local global_tokens = level(KEYS[1], global_rate, tonumber(ARGV[3]))
+local chat_tokens = level(KEYS[2], chat_rate, tonumber(ARGV[5]))
+local needed = 1 + tonumber(ARGV[6])
+
+local wait = 0
+if global_tokens < needed then
+    wait = math.ceil((needed - global_tokens) * 1000 / global_rate)
+end
+if chat_tokens < 1 then
+    wait = math.max(wait, math.ceil((1 - chat_tokens) * 1000 / chat_rate))
+end
+if wait > 0 then
+    return wait
+end
+
+redis.call('HSET', KEYS[1], 't', global_tokens - 1, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 60000)
+redis.call('HSET', KEYS[2], 't', chat_tokens - 1, 'ts', now)
+redis.call('PEXPIRE', KEYS[2], 60000)
+return 0
+"""
+
+
+class OutboundBot:
+    """Bot stand-in for handlers: send_message goes through the dispatcher, the rest is the real bot"""
+
+    def __init__(self, bot):
+        self._bot = bot
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await send_message(self._bot, chat_id, text, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._bot, name)
+
+
+async def send_message(bot, chat_id, text, priority=INTERACTIVE, queued_at=None, **kwargs):
+    """Send once the rate limits allow it, retrying 429s after their retry_after"""
+    from telegram.error import RetryAfter
+
+    queued_at = queued_at or time.time()
+    for attempt in range(MAX_ATTEMPTS):
+        await _acquire(chat_id, priority)
+        try:
+            with timer("external_call", "telegram_sendMessage"):
+                message = await bot.send_message(chat_id, text, **kwargs)
+        except RetryAfter as e:
+            _record_retry(e.retry_after)
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            continue
+        _record_sent(priority, time.time() - queued_at)
+        return message
+
+
+def queue_bulk_message(chat_id, text, **kwargs):
+    """Queue a notification behind interactive replies; kwargs must be JSON serialisable"""
+    frappe.cache().rpush(
+        BULK_QUEUE_KEY,
+        json.dumps({"chat_id": chat_id, "text": text, "kwargs": kwargs, "queued_at": time.time()})
+    )
+    _enqueue_bulk_drain()
+
+
+def drain_bulk_messages():
+    """Background job: send queued notifications at the rate left over by interactive replies"""
+    asyncio.run(_drain_bulk())
+
+
+def resume_bulk_messages():
+    """Scheduler: drain messages left behind by a job that was already finishing when they were queued"""
+    if frappe.cache().llen(BULK_QUEUE_KEY):
+        _enqueue_bulk_drain()
+
+
+async def _drain_bulk():
+    from flexiattend.triggers.flexiattend_bot import bot_session
+
+    cache = frappe.cache()
+    async with bot_session() as bot:
+        await _send_bulk(bot)
+        # A message queued after the last pop had its enqueue deduplicated
+        # against this job, so look once more before finishing
+        while cache.llen(BULK_QUEUE_KEY):
+            await _send_bulk(bot)
+
+
+async def _send_bulk(bot):
+    cache = frappe.cache()
+    while (raw := cache.lpop(BULK_QUEUE_KEY)) is not None:
+        item = json.loads(raw)
+        try:
+            await send_message(
+                bot, item["chat_id"], item["text"], priority=BULK, queued_at=item["queued_at"], **item["kwargs"]
+            )
+        except Exception:
+            _increment("failed")
+            frappe.log_error(title="FlexiAttend: bulk message not sent")
+
+
+def get_outbound_stats():
+    """Queue depth, send counts and average latency per priority"""
+    cache = frappe.cache()
+    # Native HGETALL; the wrapper's version would unpickle the values
+    raw = cache.pipeline().hgetall(cache.make_key(STATS_KEY)).execute()[0]
+    stats = {key.decode(): float(value) for key, value in raw.items()}
+    report = {
+        "bulk_queue_depth": cache.llen(BULK_QUEUE_KEY),
+        "retry_after": int(stats.get("retry_after", 0)),
+        "failed": int(stats.get("failed", 0))
+    }
+    for priority in (INTERACTIVE, BULK):
+        sent = int(stats.get(f"{priority}_sent", 0))
+        report[f"{priority}_sent"] = sent
+        report[f"{priority}_throttled"] = int(stats.get(f"{priority}_throttled", 0))
+        report[f"{priority}_avg_latency_ms"] = round(stats.get(f"{priority}_latency_ms", 0) / sent, 1) if sent else None
+    return report
+
+
+# ---- HELPERS ---- #
+def _enqueue_bulk_drain():
+    frappe.enqueue(
+        "flexiattend.triggers.outbound.drain_bulk_messages",
+        queue="short",
+        job_id="flexiattend_outbound_bulk",
+        deduplicate=True
+    )
+
+
+async def _acquire(chat_id, priority):
+    cache = frappe.cache()
+    acquire = cache.register_script(_ACQUIRE_SCRIPT)
+    keys = [
+        cache.make_key(BUCKET_KEY.format("global")),
+        cache.make_key(BUCKET_KEY.format(chat_id)),
+        cache.make_key(PAUSE_KEY)
+    ]
+    reserved = RESERVED_TOKENS if priority == BULK else 0
+    throttled = False
+    while wait_ms := acquire(
+        keys=keys,
+        args=[int(time.time() * 1000), GLOBAL_RATE, GLOBAL_BURST, CHAT_RATE, CHAT_BURST, reserved]
+    ):
+        throttled = True
+        await asyncio.sleep(wait_ms / 1000)
+    if throttled:
+        _increment(f"{priority}_throttled")
+
+
+def _record_retry(retry_after):
+    # retry_after is seconds, or a timedelta in newer python-telegram-bot releases
+    seconds = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+    cache = frappe.cache()
+    # Telegram throttles the whole bot, so every sender pauses
+    cache.set(cache.make_key(PAUSE_KEY), int((time.time() + seconds) * 1000), px=int(seconds * 1000) + 1000)
+    _increment("retry_after")
+
+
+def _record_sent(priority, seconds):
+    cache = frappe.cache()
+    key = cache.make_key(STATS_KEY)
+    pipe = cache.pipeline()
+    pipe.hincrby(key, f"{priority}_sent", 1)
+    pipe.hincrbyfloat(key, f"{priority}_latency_ms", round(seconds * 1000, 1))
+    pipe.execute()
+
+
+def _increment(field):
+    cache = frappe.cache()
+    cache.pipeline().hincrby(cache.make_key(STATS_KEY), field, 1).execute()
@@ -0,0 +1,213 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+# Long-polling runner for sites that cannot expose the webhook, started with
+#
+#   bench --site <site> flexiattend-poll --shards 2 --lanes 8
+#
+# SIGTERM (or Ctrl+C) stops polling and finishes the updates in flight first.
+#
+# The poller process is the only getUpdates client (Telegram allows one) and
+# hands every update to a shard process picked by chat_id. Each shard runs a
+# few lanes (threads) and a chat always lands on the same lane, so a chat's
+# updates are handled in order while different chats run concurrently.
+# Telegram's offset only moves past an update once a lane reports it
+# handled; whatever was in flight on a crash is delivered again, and the
+# check-in itself is idempotent per Telegram message.
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+
+import frappe
+
+POLL_TIMEOUT = 30
+# getUpdates returns everything from the offset on at once while updates are
+# in flight, so a batch of nothing new waits this long before asking again.
+# This also caps the updates in flight at one batch (100).
+BUSY_DELAY = 0.5
+RETRY_DELAY = 5
+_STOP = None
+
+log = logging.getLogger(__name__)
+
+
+class OffsetTracker:
+    """Telegram offset that never passes an update still being handled"""
+
+    def __init__(self):
+        self.offset = None
+        self.in_flight = set()
+        self.handled = set()
+
+    def is_known(self, update_id):
+        return (
+            (self.offset is not None and update_id < self.offset)
+            or update_id in self.in_flight
+            or update_id in self.handled
+        )
+
+    def start(self, update_id):
+        self.in_flight.add(update_id)
+
+    def finish(self, update_id):
+        self.in_flight.discard(update_id)
+        self.handled.add(update_id)
+        # Updates arrive in update_id order, so everything below the oldest
+        # one in flight has been handled and can be confirmed
+        low = min(self.in_flight) if self.in_flight else max(self.handled) + 1
+        if self.offset is None or low > self.offset:
+            self.offset = low
+            self.handled = {i for i in self.handled if i >= low}
+
+
+def run(site, sites_path=".", shards=1, lanes=4):
+    """Poll Telegram for ``site`` until SIGTERM or SIGINT, then finish what is in flight"""
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    try:
+        from flexiattend.triggers.bot_settings import get_erp_settings
+
+        token = get_erp_settings()["BOT_TOKEN"]
+    finally:
+        frappe.destroy()
+    if not token:
+        raise SystemExit(f"FlexiAttend Token is not set for {site}")
+
+    # Spawned, not forked, so no shard inherits sockets from this process
+    context = multiprocessing.get_context("spawn")
+    handled = context.Queue()
+    inboxes = [context.Queue() for _ in range(shards)]
+    processes = [
+        context.Process(
+            target=run_shard,
+            args=(site, sites_path, shard, shards, lanes, inbox, handled),
+            name=f"flexiattend-shard-{shard}"
+        )
+        for shard, inbox in enumerate(inboxes)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        asyncio.run(_poll(token, inboxes, handled, processes))
+    finally:
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+
+async def _poll(token, inboxes, handled, processes):
+    from telegram import Bot
+    from telegram.error import TelegramError
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    tracker = OffsetTracker()
+    async with Bot(token) as bot:
+        # getUpdates is refused while a webhook is registered
+        await bot.delete_webhook()
+        log.info("Polling with %s shard(s)", len(inboxes))
+
+        stopping = asyncio.create_task(stop.wait())
+        while not stop.is_set():
+            _collect_handled(handled, tracker)
+            poll = asyncio.create_task(
+                bot.get_updates(offset=tracker.offset, timeout=POLL_TIMEOUT, allowed_updates=["message"])
+            )
+            await asyncio.wait({poll, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            if not poll.done():
+                # Nothing fetched by a cancelled call is confirmed, so nothing is lost
+                poll.cancel()
+                break
+            try:
+                updates = poll.result()
+            except TelegramError as e:
+                log.warning("getUpdates failed: %s", e)
+                await asyncio.wait({stopping}, timeout=RETRY_DELAY)
+                continue
+
+            fresh = [update for update in updates if not tracker.is_known(update.update_id)]
+            for update in fresh:
+                tracker.start(update.update_id)
+                chat = update.effective_chat
+                if not update.message or not chat:
+                    tracker.finish(update.update_id)
+                    continue
+                inboxes[chat.id % len(inboxes)].put(update.to_dict())
+            if updates and not fresh:
+                # Only updates still being handled came back; the offset cannot
+                # pass them, so give the lanes time instead of asking again at once
+                await asyncio.wait({stopping}, timeout=BUSY_DELAY)
+
+        log.info("Stopping, %s update(s) in flight", len(tracker.in_flight))
+        for inbox in inboxes:
+            inbox.put(_STOP)
+        while any(process.is_alive() for process in processes):
+            _collect_handled(handled, tracker)
+            await asyncio.sleep(0.2)
+        _collect_handled(handled, tracker)
+
+        if tracker.offset is not None:
+            # Confirm the last handled updates; the one returned, if any, stays unconfirmed
+            await bot.get_updates(offset=tracker.offset, timeout=0, limit=1)
+
+
+def _collect_handled(handled, tracker):
+    while True:
+        try:
+            tracker.finish(handled.get_nowait())
+        except queue.Empty:
+            return
+
+
+# ---- Shard process ---- #
+def run_shard(site, sites_path, shard, shards, lanes, inbox, handled):
+    """Hand each chat of this shard to a fixed lane until the poller says stop"""
+    # The poller decides when to stop and sends _STOP once it has
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    queues = [queue.Queue() for _ in range(lanes)]
+    threads = [
+        threading.Thread(target=_run_lane, args=(site, sites_path, lane, handled), name=f"shard-{shard}-lane-{i}")
+        for i, lane in enumerate(queues)
+    ]
+    for thread in threads:
+        thread.start()
+
+    while (update := inbox.get()) is not _STOP:
+        chat_id = update["message"]["chat"]["id"]
+        queues[(chat_id // shards) % lanes].put(update)
+
+    for lane in queues:
+        lane.put(_STOP)
+    for thread in threads:
+        thread.join()
+
+
+def _run_lane(site, sites_path, lane, handled):
+    from flexiattend.triggers.flexiattend_bot import process_update
+
+    while (update := lane.get()) is not _STOP:
+        # A fresh site context per update, like a background job
+        frappe.init(site=site, sites_path=sites_path)
+        frappe.connect()
+        try:
+            process_update(update)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title="FlexiAttend Bot")
+            frappe.db.commit()
+        finally:
+            frappe.destroy()
+        # Reported even on failure, a broken update must not hold the offset back forever
+        handled.put(update["update_id"])
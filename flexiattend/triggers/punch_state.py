@@ -0,0 +1,91 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import get_datetime, getdate, now_datetime
+
+# Redis hash of employee -> "<log_type>|<time>" of the latest Employee Checkin ("" = never punched)
+LAST_PUNCH_KEY = "flexiattend:last_punch"
+
+
+class InvalidPunchSequenceError(frappe.ValidationError):
+    pass
+
+
+def get_last_punch(employee):
+    """Return (log_type, time) of the employee's latest check-in, or (None, None)"""
+    value = _hget(employee)
+    if value is None:
+        # Cache miss: one indexed lookup, then remembered until the next punch
+        rows = frappe.get_all(
+            "Employee Checkin",
+            filters={"employee": employee},
+            fields=["log_type", "time"],
+            order_by="time desc",
+            limit=1
+        )
+        value = f"{rows[0].log_type}|{rows[0].time}" if rows else ""
+        _hset(employee, value)
+
+    if not value:
+        return None, None
+    log_type, time = value.split("|", 1)
+    return log_type, get_datetime(time)
+
+
+def suggest_next_log_type(employee):
+    """IN unless the employee is checked in since today, then OUT"""
+    log_type, time = get_last_punch(employee)
+    if log_type == "IN" and getdate(time) == getdate(now_datetime()):
+        return "OUT"
+    return "IN"
+
+
+def validate_punch_sequence(employee, log_type, time=None, last_punch=None):
+    """Reject a second IN or OUT in a row on the same day"""
+    last_log_type, last_time = last_punch or get_last_punch(employee)
+    if last_log_type and last_log_type == log_type and getdate(last_time) == getdate(time or now_datetime()):
+        label = _("Check-In") if log_type == "IN" else _("Check-Out")
+        raise InvalidPunchSequenceError(
+            _("You already did a {0} at {1}.").format(label, get_datetime(last_time).strftime("%H:%M"))
+        )
+
+
+# ---- DOC EVENTS ---- #
+def on_checkin_insert(doc, method=None):
+    """Keep the cached state current for every source of check-ins, once the insert commits"""
+    employee, log_type, time = doc.employee, doc.log_type, get_datetime(doc.time)
+
+    def update_cache():
+        last_log_type, last_time = get_last_punch(employee)
+        # Devices may sync old punches late; never move the state backwards
+        if not last_time or time >= last_time:
+            _hset(employee, f"{log_type}|{time}")
+
+    frappe.db.after_commit.add(update_cache)
+
+
+def on_checkin_change(doc, method=None):
+    """Edited or deleted check-in: forget the state, it is reloaded on next use"""
+    if doc.flags.in_insert:
+        return
+    employee = doc.employee
+    frappe.db.after_commit.add(lambda: _hdel(employee))
+
+
+# ---- HELPERS ---- #
+def _hget(employee):
+    cache = frappe.cache()
+    value = cache.hmget(cache.make_key(LAST_PUNCH_KEY), [employee])[0]
+    return value.decode() if value is not None else None
+
+
+def _hset(employee, value):
+    cache = frappe.cache()
+    cache.pipeline().hset(cache.make_key(LAST_PUNCH_KEY), employee, value).execute()
+
+
+def _hdel(employee):
+    cache = frappe.cache()
+    cache.pipeline().hdel(cache.make_key(LAST_PUNCH_KEY), employee).execute()
@@ -0,0 +1,62 @@
+# Copyright (c) 2025, Sebin P Sabu and contributors
+# For license information, please see license.txt
+
+import json
+
+import frappe
+
+# Redis hash per chat: "v" = version, "d" = compact JSON of the conversation user_data
+SESSION_KEY = "flexiattend:tg:session:{0}"
+# Sliding expiry, renewed on every save. Redis drops abandoned sessions by
+# itself, so no key scan or cleanup job is needed.
+SESSION_TTL = 6 * 60 * 60
+
+# Compare-and-set: write only if nobody saved the session since it was loaded
+_SAVE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'v') or '0'
+if current ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+redis.call('HSET', KEYS[1], 'v', tonumber(ARGV[1]) + 1, 'd', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class ChatSession:
+    def __init__(self, chat_id, version=0, data=None):
+        self.chat_id = chat_id
+        self.version = version
+        self.data = data if data is not None else {}
+
+
+def load_session(chat_id):
+    """Load the session of a chat in one round trip"""
+    cache = frappe.cache()
+    version, data = cache.hmget(cache.make_key(SESSION_KEY.format(chat_id)), ["v", "d"])
+    try:
+        data = json.loads(data) if data else {}
+    except ValueError:
+        data = {}
+    return ChatSession(chat_id, int(version or 0), data)
+
+
+def save_session(session, ttl=SESSION_TTL):
+    """Save in one round trip; returns False if the session was changed concurrently"""
+    cache = frappe.cache()
+    payload = json.dumps(session.data, separators=(",", ":")) if session.data else ""
+    saved = cache.register_script(_SAVE_SCRIPT)(
+        keys=[cache.make_key(SESSION_KEY.format(session.chat_id))],
+        args=[session.version, payload, ttl]
+    )
+    if saved:
+        session.version = session.version + 1 if payload else 0
+    return bool(saved)
+
+
+def clear_session(chat_id):
+    frappe.cache().delete_value(SESSION_KEY.format(chat_id))
@@ -0,0 +1,54 @@
+# Copyright (c) 2025, Sebin P Sabu and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from flexiattend.triggers.polling import OffsetTracker
+
+
+class TestOffsetTracker(FrappeTestCase):
+	def test_offset_waits_for_oldest_in_flight(self):
+		tracker = OffsetTracker()
+		for update_id in (10, 11, 12):
+			tracker.start(update_id)
+
+		tracker.finish(11)
+		self.assertEqual(tracker.offset, 10)
+
+		tracker.finish(10)
+		self.assertEqual(tracker.offset, 12)
+
+		tracker.finish(12)
+		self.assertEqual(tracker.offset, 13)
+		self.assertFalse(tracker.in_flight)
+
+	def test_known_updates(self):
+		tracker = OffsetTracker()
+		self.assertFalse(tracker.is_known(5))
+
+		tracker.start(5)
+		tracker.start(6)
+		self.assertTrue(tracker.is_known(5))
+
+		tracker.finish(6)
+		# Handled but not yet below the offset
+		self.assertEqual(tracker.offset, 5)
+		self.assertTrue(tracker.is_known(6))
+		self.assertFalse(tracker.is_known(7))
+
+		tracker.finish(5)
+		self.assertEqual(tracker.offset, 7)
+		self.assertTrue(tracker.is_known(4))
+		self.assertFalse(tracker.handled)
+
+	def test_offset_never_moves_back(self):
+		tracker = OffsetTracker()
+		tracker.start(20)
+		tracker.finish(20)
+		self.assertEqual(tracker.offset, 21)
+
+		# A late redelivery below the offset is known and changes nothing
+		self.assertTrue(tracker.is_known(19))
+		tracker.start(25)
+		tracker.finish(25)
+		self.assertEqual(tracker.offset, 26)